@@ -1,10 +1,86 @@
 MOBILE_PROXY = False
 ROTATE_IP = False
+PROXY_CHECK_URL = 'https://api.ipify.org'  # Адрес для периодической проверки прокси
+PROXY_CHECK_INTERVAL = 60  # Как часто (в секундах) проверять все прокси. 0 - не проверять
+PROXY_MAX_FAILURES = 3  # После скольких ошибок подряд прокси убирается на карантин, а его кошельки берут здоровый прокси
+PROXY_QUARANTINE_SECONDS = 120  # Сколько секунд прокси на карантине
+PROXY_ROTATE_ATTEMPTS = 5  # Сколько раз пытаться сменить IP мобильного прокси
 
 SHUFFLE_WALLETS = True
 
-PAUSE_BETWEEN_WALLETS = [20, 50]  # Пауза в секундах [от, до] между кошельками
-PAUSE_BETWEEN_MODULES = [20, 50]
+PAUSE_BETWEEN_MODULES = [20, 50]  # Пауза в секундах [от, до] между заданиями одного кошелька
+
+WORKERS = 10  # Сколько кошельков отрабатывают одновременно
+MAX_WALLETS_PER_PROXY = 1  # Максимум кошельков одновременно на одном прокси. 0 - без ограничения
+MAX_WALLETS_PER_CHAIN = 0  # Максимум кошельков одновременно в одной сети. 0 - без ограничения
+START_SPACING = [1, 5]  # Пауза в секундах [от, до] между стартами кошельков. Не влияет на число одновременных кошельков
+PIPELINE = True  # Разделять депозит/вывод на этапы (подготовка -> отправка -> подтверждение) с отдельными воркерами
+PREPARE_WORKERS = 10  # Воркеры, которые читают балансы, получают маршруты и собирают транзакции
+SUBMIT_WORKERS = 5  # Воркеры, которые подписывают и отправляют транзакции
+CONFIRM_WORKERS = 100  # Сколько транзакций одновременно ожидают подтверждения
+PIPELINE_QUEUE_SIZE = 50  # Размер очереди между этапами
+REFERRAL_WORKERS = 10  # Сколько кошельков одновременно регистрируют реферралов (3 модуль)
+AUTH_TOKEN_REFRESH_MARGIN = 300  # За сколько секунд до истечения токена входа Superform входить заново
+STATS_INTERVAL = 60  # Как часто (в секундах) выводить размер очереди и число кошельков в работе. 0 - не выводить
+
+RETRY_ATTEMPTS = 3  # Сколько раз повторять депозит/вывод/регистрацию после ошибки. Ошибки контракта (revert) не повторяются
+RETRY_BASE_DELAY = 2  # Начальная пауза в секундах перед повтором после сетевой ошибки, дальше удваивается
+RETRY_MAX_DELAY = 60  # Максимальная пауза перед повтором
+RATE_LIMIT_DELAY = 10  # Начальная пауза при ограничении частоты запросов, если сервер не прислал Retry-After
+CIRCUIT_FAILURE_THRESHOLD = 5  # После скольких ошибок подряд приостановить все запросы к хосту (RPC или API)
+CIRCUIT_OPEN_SECONDS = 30  # На сколько секунд приостанавливать запросы к такому хосту
+
+RATE_LIMITS = {  # Ограничение запросов к хосту от всех кошельков: {хост: [запросов в секунду, сколько можно сразу]}
+    'www.superform.xyz': [5, 10],
+    'app.dynamicauth.com': [2, 4],
+}
+RATE_LIMIT_DEFAULT = [25, 50]  # Ограничение для остальных хостов (RPC). None - без ограничения
+RATE_LIMIT_PER_PROXY = False  # Считать ограничение отдельно для каждого прокси
+
+RPC_HEDGE_READS = True  # Дублировать чтение на второй RPC, если первый отвечает дольше обычного (p95), берётся первый ответ
+RPC_HEDGE_MIN_DELAY = 0.2  # Минимальная задержка в секундах перед дублированием чтения
+RPC_EWMA_ALPHA = 0.2  # Насколько быстро оценка задержки и ошибок RPC реагирует на новые запросы (0-1)
+RPC_ERROR_PENALTY = 2  # Сколько секунд добавлять к оценке RPC, который отвечает только ошибками
+
+HTTP_POOL_LIMIT = 100  # Максимум открытых соединений в одной общей HTTP-сессии
+HTTP_POOL_LIMIT_PER_HOST = 20  # Максимум соединений к одному хосту в одной сессии
+HTTP_KEEPALIVE_TIMEOUT = 30  # Сколько секунд держать простаивающее соединение открытым
+HTTP_TIMEOUT = 60  # Таймаут HTTP-запроса в секундах
+DNS_CACHE_TTL = 300  # Время кэширования DNS в секундах
+
+GAS_PRICE_TTL = 3  # Сколько секунд цена газа переиспользуется всеми кошельками в сети
+FEE_REFRESH_INTERVAL = 2  # Как часто (в секундах, примерно раз в блок) обновлять комиссии EIP-1559 по eth_feeHistory
+FEE_HISTORY_BLOCKS = 10  # По скольким последним блокам считать чаевые валидатору
+FEE_PRIORITY_PERCENTILE = 50  # Перцентиль чаевых в этих блоках
+FEE_BASE_MULTIPLIER = 2  # Во сколько раз может вырасти base fee, пока транзакция ждёт включения
+FEE_MIN_PRIORITY = 1_000_000  # Минимальные чаевые в wei
+
+REPLACE_AFTER_BLOCKS = 5  # Через сколько блоков без включения переотправить транзакцию с тем же nonce и большей комиссией
+REPLACE_FEE_BUMP = 0.15  # На сколько поднимать комиссию при каждой замене (0.15 - на 15%, нода требует минимум 10%)
+REPLACE_MAX_FEE_MULTIPLIER = 3  # Максимальная комиссия относительно первой отправки
+
+RECEIPT_CONFIRMATIONS = 1  # Сколько подтверждений ждать для транзакции
+RECEIPT_POLL_INTERVAL = 1  # Как часто (в секундах) проверять новые блоки
+RECEIPT_LOOKBACK_BLOCKS = 10  # Сколько последних блоков просмотреть при запуске отслеживания
+RECEIPT_MAX_BLOCKS_PER_POLL = 20  # Максимум блоков за один пакетный запрос
+
+MULTICALL_WINDOW = 0.05  # Сколько секунд собирать чтения балансов/allowance в один Multicall-запрос
+MULTICALL_MAX_BATCH = 200  # Максимум вызовов в одном Multicall-запросе
+
+DB_CHUNK_SIZE = 5000  # Сколько строк записывать в базу данных за один запрос при генерации
+QUOTE_CACHE_TTL = 20  # Сколько секунд переиспользовать маршрут депозита/вывода для других кошельков. 0 - не кэшировать
+QUOTE_CACHE_SIZE = 256  # Максимум маршрутов в кэше
+
+SIGNER_PROCESSES = 0  # Сколько процессов подписывают транзакции и сообщения, чтобы не тормозить остальные кошельки. 0 - подписывать в основном процессе
+SIGNER_CHUNK_SIZE = 500  # Сколько адресов вычислять из приватных ключей за одну задачу процесса при запуске
+
+STATUS_FLUSH_INTERVAL = 1  # Как часто (в секундах) записывать статусы выполненных заданий в базу данных
+
+METRICS_INTERVAL = 60  # Как часто (в секундах) записывать метрики (задержки API, RPC, подписи, базы данных) в файлы. 0 - не записывать
+METRICS_FILE = 'metrics.prom'  # Файл метрик в формате Prometheus
+METRICS_JSON_FILE = 'metrics.json'  # Файл со снимком метрик в JSON
+METRICS_PORT = 0  # Порт для отдачи метрик по http://127.0.0.1:PORT/metrics. 0 - не запускать
+METRICS_WINDOW = 1000  # По скольким последним замерам каждого этапа считать p50/p95/p99
 
 DEPOSIT = False  # Депозит в пул
 WITHDRAW = False  # Вывод из пулов
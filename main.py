@@ -1,26 +1,42 @@
-from asyncio import run, gather, sleep, create_task, set_event_loop_policy
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from asyncio import run, sleep, set_event_loop_policy
+from typing import TYPE_CHECKING
 import asyncio
 import random
 import logging
 import sys
 
-from questionary import select, Choice
+from loguru import logger
+
+from src.utils.import_timer import timed_imports, report_import_times
+
+with timed_imports('config'):
+    from config import *
 
-from src.database.generate_database import generate_database
-from src.database.models import engine, init_models
-from src.models.route import Route
-from src.utils.data.helper import private_keys, proxies
-from src.utils.manage_tasks import manage_tasks
-from src.utils.retrieve_route import get_routes
-from src.utils.runner import *
+if TYPE_CHECKING:
+    from asyncio import Future
+
+    from src.models.route import Route
+    from src.utils.pipeline import Pipeline
 
 logging.getLogger("asyncio").setLevel(logging.CRITICAL)
 
 if sys.platform == 'win32':
     set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+COMMANDS = {
+    'generate': (1, 'Сгенерировать новую базу данных с маршрутами'),
+    'run': (2, 'Отработать по базе данных'),
+    'referrals': (3, 'Зарегистрировать реферралов'),
+}
+
 
 async def get_module():
+    with timed_imports('questionary'):
+        from questionary import select, Choice
+
     result = await select(
         message="Выберете модуль",
         choices=[
@@ -39,83 +55,246 @@ async def process_task(routes: list[Route]) -> None:
         logger.success(f'Все задания из базы данных выполнены')
         return
 
-    tasks = []
-    for route in routes:
-        tasks.append(create_task(process_route(route)))
+    from src.superform.quote_cache import quote_cache
+    from src.utils.pipeline import Pipeline
+    from src.utils.proxy_manager import proxy_pool
+    from src.utils.signer import signer
+    from src.utils.worker_pool import WorkerPool
 
-        time_to_pause = random.randint(PAUSE_BETWEEN_WALLETS[0], PAUSE_BETWEEN_WALLETS[1]) \
-            if isinstance(PAUSE_BETWEEN_WALLETS, list) else PAUSE_BETWEEN_WALLETS
-        logger.info(f'Sleeping {time_to_pause} seconds before next wallet...')
-        await sleep(time_to_pause)
+    await signer.derive_addresses([route.wallet.private_key for route in routes])
+    proxy_pool.start()
 
-    await gather(*tasks)
+    pipeline = None
+    if PIPELINE:
+        pipeline = Pipeline(
+            prepare_workers=PREPARE_WORKERS,
+            submit_workers=SUBMIT_WORKERS,
+            confirm_workers=CONFIRM_WORKERS,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            stats_interval=STATS_INTERVAL
+        )
+        pipeline.start()
 
+    pool = WorkerPool(
+        lambda route: process_route(route, pipeline),
+        workers=WORKERS,
+        per_proxy=MAX_WALLETS_PER_PROXY,
+        per_chain=MAX_WALLETS_PER_CHAIN,
+        start_spacing=START_SPACING,
+        stats_interval=STATS_INTERVAL,
+        proxy_key=lambda route: route.wallet.proxy.proxy_url if route.wallet.proxy else None,
+        chain_keys=get_route_chains,
+        name='Wallets'
+    )
+    try:
+        await pool.run(routes)
+    finally:
+        if pipeline:
+            await pipeline.close()
+
+    stats = quote_cache.stats()
+    logger.info(f'Quote cache | Hits: {stats["hits"]} | Misses: {stats["misses"]}')
+
+
+async def process_referrals(private_keys: list[str], proxies: list[str | None]) -> None:
+    from src.database.base_models.pydantic_manager import DataBaseManagerConfig
+    from src.database.utils.db_manager import DataBaseUtils
+    from src.superform.auth_cache import auth_tokens
+    from src.utils.manage_tasks import REFERRAL_TASK
+    from src.utils.proxy_manager import proxy_pool
+    from src.utils.runner import ReferralJob, ReferralRunner
+    from src.utils.signer import signer
+    from src.utils.worker_pool import WorkerPool
+
+    db_utils = DataBaseUtils(manager_config=DataBaseManagerConfig(action='wallets_tasks'))
+    registered = await db_utils.get_completed_keys(REFERRAL_TASK)
+    private_keys = [private_key for private_key in private_keys if private_key not in registered]
+    if registered:
+        logger.info(f'Пропускаю {len(registered)} кошельков с уже зарегистрированным реферралом')
+    if not private_keys:
+        logger.success(f'Все реферралы уже зарегистрированы')
+        return
 
-async def process_route(route: Route) -> None:
-    if route.wallet.proxy:
-        if route.wallet.proxy.proxy_url and MOBILE_PROXY and ROTATE_IP:
-            await route.wallet.proxy.change_ip()
+    jobs = []
+    for index, private_key in enumerate(private_keys):
+        proxy = proxies[index % len(proxies)]
+        if proxy:
+            change_link = None
+            if MOBILE_PROXY:
+                proxy_url, change_link = proxy.split('|')
+            else:
+                proxy_url = proxy
 
+            proxy = proxy_pool.register(proxy_url=f'http://{proxy_url}', change_link=change_link)
+        jobs.append(ReferralJob(index=index, private_key=private_key, proxy=proxy))
+
+    await signer.derive_addresses(private_keys)
+    # Saved tokens are known before the first prefetch, so wallets that have one skip the nonce
+    await auth_tokens.load()
+    proxy_pool.start()
+
+    runner = ReferralRunner()
+    pool = WorkerPool(
+        runner.process,
+        workers=REFERRAL_WORKERS,
+        per_proxy=MAX_WALLETS_PER_PROXY,
+        start_spacing=START_SPACING,
+        stats_interval=STATS_INTERVAL,
+        proxy_key=lambda job: job.proxy.proxy_url if job.proxy else None,
+        on_admit=runner.admit,
+        name='Referrals'
+    )
+    await pool.run(jobs)
+
+    stats = auth_tokens.stats()
+    logger.info(f'Auth tokens | Reused: {stats["hits"]} | New logins: {stats["misses"]}')
+
+
+def get_route_chains(route: Route) -> set[str]:
+    task_chains = {
+        'DEPOSIT': DepositSettings.chain,
+        'WITHDRAW': WithdrawSettings.chain,
+    }
+    return {task_chains[task].upper() for task in route.tasks if task in task_chains}
+
+
+async def process_route(route: Route, pipeline: Pipeline | None = None) -> bool | Future:
+    """Runs the wallet's tasks in order and returns whether all of them completed. With the pipeline the last
+    task is only sent here: the returned future resolves to the outcome once it is confirmed, and the wallet's
+    pool slot is free meanwhile."""
+    from src.utils.manage_tasks import manage_tasks
+    from src.utils.proxy_manager import proxy_pool
+    from src.utils.runner import process_superform_deposit, process_superform_withdraw, submit_superform_task
+
+    # Waits for an IP change still in flight, or swaps a quarantined proxy for a healthy one
+    proxy = await proxy_pool.acquire(route.wallet.proxy)
     private_key = route.wallet.private_key
+    handed_over = False
+    succeeded = True
+
+    try:
+        for index, task in enumerate(route.tasks):
+            if index:
+                time_to_pause = random.randint(PAUSE_BETWEEN_MODULES[0], PAUSE_BETWEEN_MODULES[1]) \
+                    if isinstance(PAUSE_BETWEEN_MODULES, list) else PAUSE_BETWEEN_MODULES
+
+                logger.info(f'Sleeping {time_to_pause} seconds before next module...')
+                await sleep(time_to_pause)
 
-    for task in route.tasks:
-        if task == 'DEPOSIT':
-            completed = await process_superform_deposit(private_key, proxy=route.wallet.proxy)
-            if completed:
-                await manage_tasks(private_key, task)
-        if task == 'WITHDRAW':
-            completed = await process_superform_withdraw(private_key, proxy=route.wallet.proxy)
-            if completed:
-                await manage_tasks(private_key, task)
+            if pipeline and index == len(route.tasks) - 1 and task in ('DEPOSIT', 'WITHDRAW'):
+                outcome = asyncio.get_running_loop().create_future()
 
-        time_to_pause = random.randint(PAUSE_BETWEEN_MODULES[0], PAUSE_BETWEEN_MODULES[1]) \
-            if isinstance(PAUSE_BETWEEN_MODULES, list) else PAUSE_BETWEEN_MODULES
+                async def on_done(completed: bool | None, task: str = task) -> None:
+                    if completed:
+                        await manage_tasks(private_key, task)
+                    proxy_pool.release(proxy)
+                    outcome.set_result(succeeded and bool(completed))
 
-        logger.info(f'Sleeping {time_to_pause} seconds before next module...')
-        await sleep(time_to_pause)
+                await submit_superform_task(task, private_key, proxy, pipeline, on_done)
+                handed_over = True
+                return outcome
 
+            if task == 'DEPOSIT':
+                completed = await process_superform_deposit(private_key, proxy=proxy, pipeline=pipeline)
+                if completed:
+                    await manage_tasks(private_key, task)
+                succeeded = succeeded and bool(completed)
+            if task == 'WITHDRAW':
+                completed = await process_superform_withdraw(private_key, proxy=proxy, pipeline=pipeline)
+                if completed:
+                    await manage_tasks(private_key, task)
+                succeeded = succeeded and bool(completed)
+        return succeeded
+    finally:
+        if not handed_over:
+            proxy_pool.release(proxy)
 
-async def main() -> None:
-    await init_models(engine)
-    module = await get_module()
+
+async def main(module: int | None = None, show_import_times: bool = False) -> None:
+    try:
+        if module is None:
+            module = await get_module()
+        await run_module(module, show_import_times)
+    finally:
+        await close_resources()
+
+
+async def close_resources() -> None:
+    # Only what the chosen module has imported needs to be closed
+    if status_writer_module := sys.modules.get('src.database.utils.status_writer'):
+        await status_writer_module.status_writer.close()
+    if auth_cache_module := sys.modules.get('src.superform.auth_cache'):
+        await auth_cache_module.auth_tokens.close()
+    if session_pool_module := sys.modules.get('src.utils.request_client.session_pool'):
+        await session_pool_module.sessions.close()
+    if proxy_manager_module := sys.modules.get('src.utils.proxy_manager'):
+        await proxy_manager_module.proxy_pool.close()
+    if signer_module := sys.modules.get('src.utils.signer'):
+        signer_module.signer.close()
+    if metrics_module := sys.modules.get('src.utils.metrics'):
+        await metrics_module.metrics.close()
+
+
+async def run_module(module: int, show_import_times: bool = False) -> None:
+    if module not in (1, 2, 3):
+        print("Неверный выбор.")
+        return
+
+    from src.utils.data.helper import load_private_keys, load_proxies
+
+    if module == 1:
+        with timed_imports('database'):
+            from src.database.models import engine, init_models
+            from src.database.generate_database import generate_database
+    elif module == 2:
+        with timed_imports('database'):
+            from src.database.models import engine, init_models
+            from src.utils.retrieve_route import get_routes
+        with timed_imports('runner'):
+            # Loaded here rather than by the first wallet, so it shows up in the import report
+            import src.utils.runner
+    else:
+        with timed_imports('database'):
+            from src.database.models import engine, init_models
+        with timed_imports('runner'):
+            import src.utils.runner
+
+    if show_import_times:
+        report_import_times()
+
+    from src.utils.metrics import metrics
+    await metrics.start()
+
+    private_keys = load_private_keys()
 
     if module == 1:
+        await init_models(engine)
         if SHUFFLE_WALLETS:
             random.shuffle(private_keys)
         logger.debug("Генерация новой базы данных с маршрутами...")
         await generate_database(engine, private_keys)
     elif module == 2:
+        await init_models(engine)
         logger.debug("Отработка по базе данных...")
         routes = await get_routes(private_keys)
         await process_task(routes)
     elif module == 3:
+        await init_models(engine)
         logger.debug("Регистрирую реферралов")
-        proxy_index = 0
         if SHUFFLE_WALLETS:
             random.shuffle(private_keys)
-        for private_key in private_keys:
-            proxy = proxies[proxy_index]
-            proxy_index = (proxy_index + 1) % len(proxies)
-            if proxy:
-                change_link = None
-                if MOBILE_PROXY:
-                    proxy_url, change_link = proxy.split('|')
-                else:
-                    proxy_url = proxy
-
-                proxy = Proxy(proxy_url=f'http://{proxy_url}', change_link=change_link)
-                if change_link and ROTATE_IP and MOBILE_PROXY:
-                    await proxy.change_ip()
-
-            await process_register_referral(private_key, proxy)
-            time_to_pause = random.randint(PAUSE_BETWEEN_WALLETS[0], PAUSE_BETWEEN_WALLETS[1]) \
-                if isinstance(PAUSE_BETWEEN_WALLETS, list) else PAUSE_BETWEEN_WALLETS
-            logger.info(f'Sleeping {time_to_pause} seconds before next wallet...')
-            await sleep(time_to_pause)
-    else:
-        print("Неверный выбор.")
-        return
+        await process_referrals(private_keys, load_proxies())
+
+
+def parse_args():
+    parser = ArgumentParser(description='Superform Soft. Без команды показывает меню выбора модуля.')
+    parser.add_argument('--import-times', action='store_true', help='вывести время импорта модулей')
+    commands = parser.add_subparsers(dest='command')
+    for command, (_, description) in COMMANDS.items():
+        commands.add_parser(command, help=description)
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    run(main())
+    args = parse_args()
+    run(main(COMMANDS[args.command][0] if args.command else None, args.import_times))
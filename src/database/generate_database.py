@@ -1,33 +1,21 @@
+from time import time
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from loguru import logger
 
-from src.database.base_models.pydantic_manager import DataBaseManagerConfig
 from src.database.models import WorkingWallets, WalletsTasks
-from src.database.utils.db_manager import DataBaseUtils
-from src.utils.data.helper import proxies
+from src.utils.data.helper import load_proxies
+from src.utils.manage_tasks import REFERRAL_TASK
 from config import *
 
 
-async def clear_database(engine) -> None:
-    async with AsyncSession(engine) as session:
-        async with session.begin():
-            for model in [WorkingWallets, WalletsTasks]:
-                await session.execute(delete(model))
-            await session.commit()
-    logger.info("База данных очищена.")
-
-
-async def generate_database(engine, private_keys: list[str]) -> None:
-    await clear_database(engine)
-    tasks = []
-
-    if DEPOSIT:
-        tasks.append('DEPOSIT')
-    if WITHDRAW:
-        tasks.append('WITHDRAW')
-
+def build_rows(private_keys: list[str], tasks: list[str]) -> tuple[list[dict], list[dict]]:
+    proxies = load_proxies()
+    wallets_rows = []
+    tasks_rows = []
     proxy_index = 0
     for private_key in private_keys:
         proxy = proxies[proxy_index]
@@ -41,25 +29,57 @@ async def generate_database(engine, private_keys: list[str]) -> None:
             else:
                 proxy_url = proxy
 
-        db_utils = DataBaseUtils(
-            manager_config=DataBaseManagerConfig(
-                action='working_wallets'
-            )
-        )
-
-        await db_utils.add_to_db(
-            private_key=private_key,
-            proxy=f'{proxy_url}|{change_link}' if MOBILE_PROXY else proxy_url,
-            status='pending',
-        )
+        wallets_rows.append({
+            'private_key': private_key,
+            'proxy': f'{proxy_url}|{change_link}' if MOBILE_PROXY else proxy_url,
+            'status': 'pending',
+        })
         for task in tasks:
-            db_utils = DataBaseUtils(
-                manager_config=DataBaseManagerConfig(
-                    action='wallets_tasks'
-                )
-            )
-            await db_utils.add_to_db(
-                private_key=private_key,
-                status='pending',
-                task_name=task
-            )
+            tasks_rows.append({
+                'private_key': private_key,
+                'task_name': task,
+                'status': 'pending',
+            })
+
+    return wallets_rows, tasks_rows
+
+
+async def generate_database(engine, private_keys: list[str]) -> None:
+    tasks = []
+
+    if DEPOSIT:
+        tasks.append('DEPOSIT')
+    if WITHDRAW:
+        tasks.append('WITHDRAW')
+
+    started_at = time()
+    wallets_rows, tasks_rows = build_rows(private_keys, tasks)
+
+    async with AsyncSession(engine) as session:
+        async with session.begin():
+            await session.execute(delete(WorkingWallets))
+            await session.execute(delete(WalletsTasks).where(WalletsTasks.task_name != REFERRAL_TASK))
+            logger.info("База данных очищена.")
+
+            # Core executemany on the session's connection, so rowcount counts only the rows inserted
+            connection = await session.connection()
+            inserted = {}
+            for model, rows in [(WorkingWallets, wallets_rows), (WalletsTasks, tasks_rows)]:
+                inserted[model] = 0
+                for chunk_start in range(0, len(rows), DB_CHUNK_SIZE):
+                    chunk = rows[chunk_start:chunk_start + DB_CHUNK_SIZE]
+                    # Keys listed twice in wallets.txt are written once
+                    result = await connection.execute(sqlite_insert(model).on_conflict_do_nothing(), chunk)
+                    inserted[model] += result.rowcount
+                    logger.info(
+                        f'{model.__tablename__}: записано {inserted[model]} '
+                        f'(обработано {chunk_start + len(chunk)}/{len(rows)})'
+                    )
+
+            wallets_count = inserted[WorkingWallets]
+            tasks_count = inserted[WalletsTasks]
+
+    logger.success(
+        f'✔️ | Added {wallets_count} wallets and {tasks_count} tasks to DataBase '
+        f'in {time() - started_at:.1f}s'
+    )
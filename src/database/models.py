@@ -8,6 +8,12 @@ from sqlalchemy import (
     Integer,
     Column,
     String,
+    Index,
+    delete,
+    event,
+    func,
+    inspect,
+    select,
 )
 
 Base = declarative_base()
@@ -18,7 +24,11 @@ class WorkingWallets(Base):
     id = Column(Integer, Sequence('working_wallets_id_seq'), primary_key=True)
     private_key = Column(String)
     proxy = Column(String, nullable=True)
-    status = Column(String)
+    status = Column(String, index=True)
+
+    __table_args__ = (
+        Index('uq_working_wallets_private_key', 'private_key', unique=True),
+    )
 
 
 class WalletsTasks(Base):
@@ -28,6 +38,23 @@ class WalletsTasks(Base):
     task_name = Column(String, unique=False)
     status = Column(String, unique=False)
 
+    __table_args__ = (
+        Index('uq_wallets_tasks_private_key_task_name', 'private_key', 'task_name', unique=True),
+        Index('ix_wallets_tasks_private_key_status', 'private_key', 'status'),
+    )
+
+
+class AuthTokens(Base):
+    __tablename__ = 'auth_tokens'
+    id = Column(Integer, Sequence('auth_tokens_id_seq'), primary_key=True)
+    private_key = Column(String)
+    token = Column(String)
+    expires_at = Column(Integer)
+
+    __table_args__ = (
+        Index('uq_auth_tokens_private_key', 'private_key', unique=True),
+    )
+
 
 logging.getLogger('sqlalchemy.engine').setLevel(logging.ERROR)
 
@@ -37,6 +64,31 @@ engine = create_async_engine(
 )
 
 
+@event.listens_for(engine.sync_engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+def create_missing_indexes(connection) -> None:
+    # create_all skips tables that already exist, so databases from older versions get their indexes here
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                # Older databases had no unique keys, so keep only the latest row of every duplicate
+                latest_ids = select(func.max(table.c.id)).group_by(*index.columns)
+                connection.execute(delete(table).where(table.c.id.not_in(latest_ids)))
+            index.create(connection)
+
+
 async def init_models(engine: AsyncEngine):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
@@ -5,13 +5,15 @@ from typing import (
     Type,
 )
 
-from sqlalchemy import select
+from sqlalchemy import delete, select, update, and_, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from loguru import logger
 
 from src.database.base_models.pydantic_manager import DataBaseManagerConfig
-from src.database.models import engine, WorkingWallets, WalletsTasks
+from src.database.models import engine, WorkingWallets, WalletsTasks, AuthTokens
+from src.utils.metrics import metrics
 
 
 class DataBaseUtils:
@@ -35,77 +37,94 @@ class DataBaseUtils:
                         traceback: Optional[types.TracebackType]) -> None:
         await self.session.close()
 
-    async def add_to_db(
-            self,
-            private_key: str,
-            proxy: str = None,
-            *,
-            status: str,
-            task_name: str | None = None
-    ) -> None:
+    @metrics.timed('db')
+    async def update_tasks_status(self, entries: list[dict]) -> None:
+        """Upserts many (private_key, task_name, status) rows and completes finished wallets in one transaction."""
+        query = sqlite_insert(WalletsTasks)
+        query = query.on_conflict_do_update(
+            index_elements=['private_key', 'task_name'],
+            set_={'status': query.excluded.status}
+        )
+        private_keys = {entry['private_key'] for entry in entries}
+        pending_tasks = select(WalletsTasks.id).where(
+            WalletsTasks.private_key == WorkingWallets.private_key,
+            WalletsTasks.status == 'pending'
+        )
+
         async with self.session() as session:
-            query = select(self.table_object).filter_by(private_key=private_key)
+            await session.execute(query, entries)
+            result = await session.execute(
+                update(WorkingWallets)
+                .where(WorkingWallets.private_key.in_(private_keys), ~pending_tasks.exists())
+                .values(status='completed')
+            )
+            await session.commit()
 
-            if task_name and self.table_object is WalletsTasks:
-                query = query.filter_by(task_name=task_name)
+        logger.info(f'🔄 | Saved {len(entries)} task statuses, {result.rowcount} wallets completed')
 
+    @metrics.timed('db')
+    async def get_completed_keys(self, task_name: str) -> set[str]:
+        async with self.session() as session:
+            query = select(WalletsTasks.private_key).filter_by(task_name=task_name, status='completed')
             result = await session.execute(query)
-            existing_entry = result.scalars().first()
-
-            if existing_entry:
-                existing_entry.status = status
-                logger.info(f'🔄 | Updated existing entry '
-                            f'with private_key={private_key[:4]}...{private_key[-4:]} and task_name={task_name}')
-            else:
-                transaction = self.table_object(
-                    private_key=private_key,
-                    status=status
-                )
-                if self.table_object is WorkingWallets:
-                    transaction.proxy = proxy
+            private_keys = result.scalars().all()
 
-                if self.table_object is WalletsTasks:
-                    transaction.task_name = task_name
-
-                session.add(transaction)
-                logger.success(
-                    f'✔️ | Successfully added new entry to DataBase '
-                    f'with private_key={private_key[:4]}...{private_key[-4:]} and task_name={task_name}'
-                )
+        return set(private_keys)
 
+    @metrics.timed('db')
+    async def get_auth_tokens(self, valid_after: int) -> dict[str, tuple[str, int]]:
+        """Returns {private_key: (token, expires_at)} for every token still valid at `valid_after`, dropping the rest."""
+        async with self.session() as session:
+            await session.execute(delete(AuthTokens).where(AuthTokens.expires_at <= valid_after))
+            result = await session.execute(select(AuthTokens.private_key, AuthTokens.token, AuthTokens.expires_at))
+            rows = result.all()
             await session.commit()
 
-            if self.table_object is WalletsTasks and status == 'completed':
-                await self.check_and_update_working_wallets(private_key, session)
-
-    async def check_and_update_working_wallets(self, private_key: str, session) -> None:
-        query = select(WalletsTasks).filter_by(private_key=private_key, status='pending')
-        result = await session.execute(query)
-        pending_tasks = result.scalars().all()
+        return {private_key: (token, expires_at) for private_key, token, expires_at in rows}
 
-        if not pending_tasks:
-            query = select(WorkingWallets).filter_by(private_key=private_key)
-            result = await session.execute(query)
-            working_wallet = result.scalars().first()
+    @metrics.timed('db')
+    async def save_auth_tokens(self, tokens: dict[str, tuple[str | None, int]]) -> None:
+        """Stores {private_key: (token, expires_at)} in one transaction, deleting the keys whose token is None."""
+        deleted = [private_key for private_key, (token, _) in tokens.items() if token is None]
+        saved = [
+            {'private_key': private_key, 'token': token, 'expires_at': expires_at}
+            for private_key, (token, expires_at) in tokens.items() if token is not None
+        ]
 
-            if working_wallet:
-                working_wallet.status = 'completed'
-                await session.commit()
-                logger.info(f'✔️ | Updated working_wallets entry to completed for '
-                            f'private_key={private_key[:4]}...{private_key[-4:]}')
-
-    async def get_uncompleted_wallets(self):
         async with self.session() as session:
-            query = select(WorkingWallets).filter_by(status='pending')
-            result = await session.execute(query)
-            wallets = result.scalars().all()
-
-        return wallets
+            if deleted:
+                await session.execute(delete(AuthTokens).where(AuthTokens.private_key.in_(deleted)))
+            if saved:
+                query = sqlite_insert(AuthTokens)
+                query = query.on_conflict_do_update(
+                    index_elements=['private_key'],
+                    set_={'token': query.excluded.token, 'expires_at': query.excluded.expires_at}
+                )
+                await session.execute(query, saved)
+            await session.commit()
 
-    async def get_wallet_pending_tasks(self, private_key: str):
+    @metrics.timed('db')
+    async def get_pending_routes(self) -> list[tuple[str, str | None, str | None]]:
+        """Returns (private_key, proxy, comma-separated pending task names) for every pending wallet in one query."""
         async with self.session() as session:
-            query = select(WalletsTasks).filter_by(private_key=private_key, status='pending')
+            query = (
+                select(
+                    WorkingWallets.private_key,
+                    WorkingWallets.proxy,
+                    func.group_concat(WalletsTasks.task_name)
+                )
+                .outerjoin(
+                    WalletsTasks,
+                    and_(
+                        WalletsTasks.private_key == WorkingWallets.private_key,
+                        WalletsTasks.status == 'pending'
+                    )
+                )
+                .where(WorkingWallets.status == 'pending')
+                .group_by(WorkingWallets.id)
+                .order_by(WorkingWallets.id)
+            )
             result = await session.execute(query)
-            tasks = result.scalars().all()
+            rows = result.all()
 
-        return tasks
+        return rows
@@ -0,0 +1,74 @@
+from asyncio import Event, Task, TimeoutError, create_task, wait_for, CancelledError
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import STATUS_FLUSH_INTERVAL, DB_CHUNK_SIZE
+from src.database.base_models.pydantic_manager import DataBaseManagerConfig
+from src.database.utils.db_manager import DataBaseUtils
+
+
+class StatusWriter:
+    """Collects task status changes in memory and writes them to the database in batches.
+
+    Wallet workers only enqueue, so they never wait on SQLite locks; a single background task
+    flushes everything collected during STATUS_FLUSH_INTERVAL in one transaction.
+    """
+
+    def __init__(self, flush_interval: float = STATUS_FLUSH_INTERVAL) -> None:
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._wakeup = Event()
+        self._task: Optional[Task] = None
+        self._db_utils: Optional[DataBaseUtils] = None
+
+    def put(self, private_key: str, task_name: str, status: str) -> None:
+        self._pending[(private_key, task_name)] = status
+        if self._task is None or self._task.done():
+            self._task = create_task(self._run())
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        entries = [
+            {'private_key': private_key, 'task_name': task_name, 'status': status}
+            for (private_key, task_name), status in batch.items()
+        ]
+        if self._db_utils is None:
+            self._db_utils = DataBaseUtils(manager_config=DataBaseManagerConfig(action='wallets_tasks'))
+
+        for chunk_start in range(0, len(entries), DB_CHUNK_SIZE):
+            chunk = entries[chunk_start:chunk_start + DB_CHUNK_SIZE]
+            try:
+                await self._db_utils.update_tasks_status(chunk)
+            except Exception as ex:
+                logger.error(f'Failed to save {len(chunk)} task statuses: {ex}')
+                # Keep them for the next flush unless a newer status arrived in the meantime
+                for entry in chunk:
+                    self._pending.setdefault((entry['private_key'], entry['task_name']), entry['status'])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await wait_for(self._wakeup.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            await self.flush()
+            if self._wakeup.is_set():
+                return
+
+    async def close(self) -> None:
+        """Flushes everything still pending. Called on shutdown."""
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+            try:
+                await self._task
+            except CancelledError:
+                pass
+        await self.flush()
+        self._wakeup.clear()
+
+
+status_writer = StatusWriter()
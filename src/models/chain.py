@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import List
+
 from pydantic import BaseModel
 
 
@@ -7,6 +9,6 @@ class Chain(BaseModel):
     chain_name: str
 
     native_token: str
-    rpc: str
+    rpc: str | List[str]
 
     chain_id: int
@@ -5,7 +5,7 @@ from typing import List, Any
 from pydantic import BaseModel, model_validator, Field
 
 from config import MOBILE_PROXY
-from src.utils.proxy_manager import Proxy
+from src.utils.proxy_manager import proxy_pool
 
 
 class Wallet(BaseModel):
@@ -23,7 +23,7 @@ class Wallet(BaseModel):
             else:
                 proxy_url = proxy
 
-            proxy = Proxy(proxy_url=f'http://{proxy_url}', change_link=change_link)
+            proxy = proxy_pool.register(proxy_url=f'http://{proxy_url}', change_link=change_link)
             values['proxy'] = proxy
 
         return values
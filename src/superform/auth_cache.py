@@ -0,0 +1,143 @@
+import base64
+import json
+from asyncio import Event, Lock, Task, TimeoutError, create_task, wait_for, CancelledError
+from time import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import AUTH_TOKEN_REFRESH_MARGIN, STATUS_FLUSH_INTERVAL
+from src.database.base_models.pydantic_manager import DataBaseManagerConfig
+from src.database.utils.db_manager import DataBaseUtils
+
+
+def get_token_expiry(token: str) -> Optional[int]:
+    """Unix time from the `exp` claim of a JWT. The signature is not checked, the server does that."""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return int(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AuthTokenCache:
+    """dynamicauth JWTs per wallet, kept in memory and in the auth_tokens table so they survive restarts.
+
+    A token is handed out until AUTH_TOKEN_REFRESH_MARGIN seconds before its `exp`, after that the wallet
+    logs in again. Tokens without a readable `exp` are not cached.
+    New and dropped tokens are written by a background task every STATUS_FLUSH_INTERVAL seconds,
+    like task statuses, so a wallet never waits on SQLite.
+    """
+
+    def __init__(
+            self,
+            refresh_margin: float = AUTH_TOKEN_REFRESH_MARGIN,
+            flush_interval: float = STATUS_FLUSH_INTERVAL
+    ) -> None:
+        self.refresh_margin = refresh_margin
+        self.flush_interval = flush_interval
+        self._tokens: Dict[str, Tuple[str, int]] = {}
+        self._locks: Dict[str, Lock] = {}
+        self._loaded = False
+        self._db_utils: Optional[DataBaseUtils] = None
+        # {private_key: (token, expires_at)}, with a None token for tokens to delete
+        self._unsaved: Dict[str, Tuple[Optional[str], int]] = {}
+        self._wakeup = Event()
+        self._writer: Optional[Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def db_utils(self) -> DataBaseUtils:
+        if self._db_utils is None:
+            self._db_utils = DataBaseUtils(manager_config=DataBaseManagerConfig(action='auth_tokens'))
+        return self._db_utils
+
+    async def load(self) -> None:
+        """Reads every stored token that is still fresh. Called once, before the first lookup."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            self._tokens.update(await self.db_utils.get_auth_tokens(int(time() + self.refresh_margin)))
+        except Exception as ex:
+            logger.error(f'Failed to load saved auth tokens: {ex}')
+
+    def lock(self, private_key: str) -> Lock:
+        """Held while a wallet logs in, so a retry or a second task of the same wallet waits for its token."""
+        if private_key not in self._locks:
+            self._locks[private_key] = Lock()
+        return self._locks[private_key]
+
+    def is_fresh(self, private_key: str) -> bool:
+        entry = self._tokens.get(private_key)
+        return entry is not None and entry[1] - self.refresh_margin > time()
+
+    async def get(self, private_key: str) -> Optional[str]:
+        await self.load()
+        if self.is_fresh(private_key):
+            self.hits += 1
+            return self._tokens[private_key][0]
+
+        self.misses += 1
+        self._tokens.pop(private_key, None)
+        return None
+
+    def put(self, private_key: str, token: str) -> None:
+        expires_at = get_token_expiry(token)
+        if expires_at is None:
+            return
+
+        self._tokens[private_key] = (token, expires_at)
+        self._save_later(private_key, token, expires_at)
+
+    def invalidate(self, private_key: str) -> None:
+        if self._tokens.pop(private_key, None) is None:
+            return
+        self._save_later(private_key, None, 0)
+
+    def _save_later(self, private_key: str, token: Optional[str], expires_at: int) -> None:
+        self._unsaved[private_key] = (token, expires_at)
+        if self._writer is None or self._writer.done():
+            self._writer = create_task(self._run())
+
+    async def flush(self) -> None:
+        if not self._unsaved:
+            return
+
+        batch, self._unsaved = self._unsaved, {}
+        try:
+            await self.db_utils.save_auth_tokens(batch)
+        except Exception as ex:
+            logger.error(f'Failed to save {len(batch)} auth tokens: {ex}')
+            # Keep them for the next flush unless the wallet got a newer token in the meantime
+            for private_key, entry in batch.items():
+                self._unsaved.setdefault(private_key, entry)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await wait_for(self._wakeup.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            await self.flush()
+            if self._wakeup.is_set():
+                return
+
+    async def close(self) -> None:
+        """Writes every token still unsaved. Called on shutdown."""
+        if self._writer is not None and not self._writer.done():
+            self._wakeup.set()
+            try:
+                await self._writer
+            except CancelledError:
+                pass
+        await self.flush()
+        self._wakeup.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._tokens)}
+
+
+auth_tokens = AuthTokenCache()
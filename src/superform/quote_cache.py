@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from copy import deepcopy
+from time import monotonic
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from config import QUOTE_CACHE_TTL, QUOTE_CACHE_SIZE
+
+
+def rebind(route: Any, replacements: Dict[str, str], counts: Optional[Dict[str, int]] = None) -> Any:
+    """Copies a route, swapping every string found in `replacements` (case-insensitive) for its new value.
+
+    With `counts`, the number of swaps of each replaced string is added to it.
+    """
+    if isinstance(route, dict):
+        return {key: rebind(value, replacements, counts) for key, value in route.items()}
+    if isinstance(route, list):
+        return [rebind(value, replacements, counts) for value in route]
+    if isinstance(route, str) and route.lower() in replacements:
+        if counts is not None:
+            counts[route.lower()] = counts.get(route.lower(), 0) + 1
+        return replacements[route.lower()]
+    return route
+
+
+def quote_targets(data: str, address: str, amounts: Iterable[int]) -> bool:
+    """Whether quoted calldata carries the wallet address and every amount as 32-byte ABI words."""
+    calldata = data.lower().removeprefix('0x')
+    words = [address.lower().removeprefix('0x').rjust(64, '0')] + [f'{amount:064x}' for amount in amounts]
+    return all(word in calldata for word in words)
+
+
+class QuoteCache:
+    """LRU cache of `/calculate/` route responses with a TTL.
+
+    Each entry keeps the route together with the wallet address and amounts it was calculated for,
+    so another wallet can reuse it as a template by rebinding those values to its own.
+    """
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL, max_size: int = QUOTE_CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, Tuple[float, Any, Dict[str, str]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, bindings: Dict[str, str]) -> Optional[Any]:
+        """Returns the cached route rebound to `bindings` (placeholder name -> this wallet's value).
+
+        An entry where any of the bindings is not found is dropped and counted as a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        _, route, template_bindings = entry
+        replacements = {
+            template_bindings[name].lower(): value
+            for name, value in bindings.items() if name in template_bindings
+        }
+        counts: Dict[str, int] = {}
+        rebound = rebind(route, replacements, counts)
+        replaced = all(
+            name in template_bindings and counts.get(template_bindings[name].lower())
+            for name in bindings
+        )
+        if not replaced:
+            # Part of the template would still belong to the wallet it was calculated for
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return rebound
+
+    def put(self, key: Hashable, route: Any, bindings: Dict[str, str]) -> None:
+        if not self.ttl or not route:
+            return
+        self._entries[key] = (monotonic() + self.ttl, deepcopy(route), dict(bindings))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+quote_cache = QuoteCache()
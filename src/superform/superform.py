@@ -1,21 +1,30 @@
-from typing import Optional
+from asyncio import Task, create_task, gather
+from typing import Awaitable, Callable, Dict, Optional
 from datetime import datetime, timezone
+from decimal import Decimal
 
-from eth_account.messages import encode_defunct
 from loguru import logger
 import pyuseragents
 
 from config import WithdrawSettings
 from src.models.contracts import PoolData, SuperFormData
 from src.models.superform import DepositConfig, WithdrawConfig
+from src.superform.auth_cache import auth_tokens
+from src.superform.quote_cache import quote_cache, quote_targets
+from src.utils.contracts import contracts
 from src.utils.data.chains import chain_mapping
 from src.utils.data.tokens import vault_ids
 from src.utils.proxy_manager import Proxy
 from src.utils.request_client.client import RequestClient
+from src.utils.signer import signer
 from src.utils.user.account import Account
 from src.utils.wrappers.decorators import retry
 
 
+# Known superposition allowances of the SuperForm router per wallet: {wallet: {superposition_id: amount}}
+known_approvals: Dict[str, Dict[int, int]] = {}
+
+
 class SuperForm(Account, RequestClient):
     def __init__(
             self,
@@ -26,16 +35,21 @@ class SuperForm(Account, RequestClient):
     ):
         if deposit_config:
             rpc = deposit_config.chain.rpc
+            chain_name = deposit_config.chain.chain_name
         elif withdraw_config:
             rpc = withdraw_config.chain.rpc
+            chain_name = withdraw_config.chain.chain_name
         else:
             rpc = None
+            chain_name = 'BASE'
 
-        Account.__init__(self, private_key=private_key, rpc=rpc, proxy=proxy)
+        Account.__init__(self, private_key=private_key, rpc=rpc, proxy=proxy, chain_name=chain_name)
         RequestClient.__init__(self, proxy=proxy)
 
         self.deposit_config = deposit_config
         self.withdraw_config = withdraw_config
+        self.quote_key = None
+        self.nonce_task: Optional[Task] = None
 
         self.headers = {
             'accept': 'application/json, text/plain, */*',
@@ -56,15 +70,16 @@ class SuperForm(Account, RequestClient):
         else:
             return f'[{self.wallet_address}] | Adding referral code'
 
-    async def get_deposit_data(self, amount: float) -> tuple[str, str, int, float]:
+    async def get_deposit_data(self, amount: float, use_cache: bool = True) -> tuple[str, str, int, float]:
         vaults_ids = [vault_ids[vault] for vault in self.deposit_config.vaults]
         single_amount = amount / len(vaults_ids)
+        chain_id = await self.chain_state.get_chain_id(self.web3)
         json_data = []
         for vault_id in vaults_ids:
             json_data.append({
                 'user_address': self.wallet_address,
                 'from_token_address': self.deposit_config.token.address,
-                'from_chain_id': await self.web3.eth.chain_id,
+                'from_chain_id': chain_id,
                 'amount_in': str(single_amount),
                 'refund_address': self.wallet_address,
                 'vault_id': vault_id,
@@ -77,12 +92,20 @@ class SuperForm(Account, RequestClient):
                 'exclude_bridges': [],
             })
 
-        route = await self.make_request(
-            method="POST",
-            url='https://www.superform.xyz/api/proxy/deposit/calculate/',
-            headers=self.headers,
-            json=json_data
+        cache_key = (
+            'deposit', chain_id, self.deposit_config.token.address.lower(), tuple(vaults_ids), str(single_amount)
         )
+        bindings = {'address': self.wallet_address, 'amount': str(single_amount)}
+        route = quote_cache.get(cache_key, bindings) if use_cache else None
+        self.quote_key = cache_key if route else None
+        if not route:
+            route = await self.make_request(
+                method="POST",
+                url='https://www.superform.xyz/api/proxy/deposit/calculate/',
+                headers=self.headers,
+                json=json_data
+            )
+            quote_cache.put(cache_key, route, bindings)
 
         response_json = await self.make_request(
             method='POST',
@@ -90,6 +113,10 @@ class SuperForm(Account, RequestClient):
             headers=self.headers,
             json=route
         )
+        if self.quote_key and not await self.deposit_quote_fits(response_json, single_amount):
+            # The API did not accept the rebound template or built the tx for someone else, so ask for a fresh route
+            quote_cache.invalidate(cache_key)
+            return await self.get_deposit_data(amount, use_cache=False)
 
         to = response_json['to']
         data = response_json['data']
@@ -97,8 +124,46 @@ class SuperForm(Account, RequestClient):
         value_usd = float(response_json['value_usd'])
         return to, data, value, value_usd
 
-    @retry(retries=3, delay=30, backoff=1.5)
+    async def deposit_quote_fits(self, response_json: dict | None, single_amount: float) -> bool:
+        """Whether the tx built from a cached route deposits this wallet's amount from this wallet."""
+        if not response_json:
+            return False
+        if self.deposit_config.token.name.upper() == 'ETH':
+            decimals = 18
+        else:
+            decimals = await self.get_decimals(self.deposit_config.token.address, self.web3)
+        amount = int(Decimal(str(single_amount)) * 10 ** decimals)
+        return quote_targets(response_json['data'], self.wallet_address, [amount])
+
+    async def estimate_quoted_gas(self, tx: dict, requote: Callable[[], Awaitable[tuple]]) -> int:
+        """Estimates gas for a quoted tx. A route rebound from the cache that reverts is quoted fresh once.
+
+        Done here rather than by the retry, since the retry policy gives up on reverts straight away.
+        """
+        try:
+            return await self.web3.eth.estimate_gas(tx)
+        except Exception as ex:
+            if not self.quote_key:
+                raise
+            logger.warning(f'[{self.wallet_address}] | Cached route does not fit this wallet, quoting it again | {ex}')
+            quote_cache.invalidate(self.quote_key)
+            to, data, value = await requote()
+            if not data:
+                raise
+        tx.update({'to': self.web3.to_checksum_address(to), 'value': value, 'data': data})
+        return await self.web3.eth.estimate_gas(tx)
+
+    @retry()
     async def deposit(self) -> Optional[bool]:
+        tx = await self.prepare_deposit()
+        if not isinstance(tx, dict):
+            return tx
+
+        tx_hash = await self.sign_transaction(tx)
+        return await self.confirm_deposit(tx_hash)
+
+    async def prepare_deposit(self) -> dict | bool | None:
+        """Reads balances, quotes the route and approves the token. Returns the deposit tx ready for signing."""
         native_balance = await self.get_wallet_balance(is_native=True)
         if native_balance == 0:
             logger.error(f'[{self.wallet_address}] | ETH balance is 0')
@@ -120,29 +185,38 @@ class SuperForm(Account, RequestClient):
                 decimals = await self.get_decimals(self.deposit_config.token.address, self.web3)
                 amount = deposit_token_balance / 10 ** decimals * self.deposit_config.deposit_percentage
 
+        async def approve(spender: str) -> None:
+            if self.deposit_config.token.name != 'ETH':
+                await self.approve_token(
+                    amount=amount,
+                    private_key=self.private_key,
+                    from_token_address=self.deposit_config.token.address,
+                    spender=spender,
+                    address_wallet=self.wallet_address,
+                    web3=self.web3
+                )
+
+        async def requote() -> tuple[str, str, int]:
+            fresh_to, fresh_data, fresh_value, _ = await self.get_deposit_data(amount, use_cache=False)
+            await approve(fresh_to)
+            return fresh_to, fresh_data, fresh_value
+
         to, data, value, value_usd = await self.get_deposit_data(amount)
-        if self.deposit_config.token.name != 'ETH':
-            await self.approve_token(
-                amount=amount,
-                private_key=self.private_key,
-                from_token_address=self.deposit_config.token.address,
-                spender=to,
-                address_wallet=self.wallet_address,
-                web3=self.web3
-            )
+        await approve(to)
 
         tx = {
-            'chainId': await self.web3.eth.chain_id,
+            'chainId': await self.chain_state.get_chain_id(self.web3),
             'from': self.wallet_address,
             'to': self.web3.to_checksum_address(to),
-            'nonce': await self.web3.eth.get_transaction_count(self.wallet_address),
             'value': value,
-            'gasPrice': int(await self.web3.eth.gas_price * 1.2),
+            **await self.chain_state.get_fee_params(self.web3),
             'data': data
         }
-        gas = await self.web3.eth.estimate_gas(tx)
+        gas = await self.estimate_quoted_gas(tx, requote)
         tx['gas'] = gas
-        tx_hash = await self.sign_transaction(tx)
+        return tx
+
+    async def confirm_deposit(self, tx_hash: str) -> Optional[bool]:
         confirmed = await self.wait_until_tx_finished(tx_hash)
         if confirmed:
             logger.success(
@@ -161,7 +235,7 @@ class SuperForm(Account, RequestClient):
         )
         return response_json
 
-    async def get_withdraw_data(self, deposits):
+    async def get_withdraw_data(self, deposits, use_cache: bool = True):
         superpositions = deposits['superpositions']
         if not superpositions:
             logger.warning(f'[{self.wallet_address}] | Positions not found')
@@ -197,12 +271,27 @@ class SuperForm(Account, RequestClient):
                 'vault_id': vault_id,
             })
 
-        route = await self.make_request(
-            method='POST',
-            url='https://www.superform.xyz/api/proxy/withdraw/calculate/',
-            headers=self.headers,
-            json=json_data
+        cache_key = (
+            'withdraw', self.withdraw_config.chain.chain_id, self.withdraw_config.target_token.address.lower(),
+            tuple(
+                (superposition_id, chain_id, str(balance))
+                for superposition_id, balance, chain_id in zip(superposition_ids, balances, chain_ids)
+            )
         )
+        bindings = {'address': self.wallet_address}
+        for index, balance in enumerate(balances):
+            bindings[f'balance_{index}'] = str(balance)
+
+        route = quote_cache.get(cache_key, bindings) if use_cache else None
+        self.quote_key = cache_key if route else None
+        if not route:
+            route = await self.make_request(
+                method='POST',
+                url='https://www.superform.xyz/api/proxy/withdraw/calculate/',
+                headers=self.headers,
+                json=json_data
+            )
+            quote_cache.put(cache_key, route, bindings)
 
         response_json = await self.make_request(
             method='POST',
@@ -210,6 +299,12 @@ class SuperForm(Account, RequestClient):
             headers=self.headers,
             json=route
         )
+        fits = response_json and quote_targets(
+            response_json['data'], self.wallet_address, [int(balance) for balance in balances]
+        )
+        if self.quote_key and not fits:
+            quote_cache.invalidate(cache_key)
+            return await self.get_withdraw_data(deposits, use_cache=False)
         if not response_json:
             logger.error(f'[{self.wallet_address}] | Withdraw failed. Route not found.')
             return None, None, None
@@ -218,8 +313,17 @@ class SuperForm(Account, RequestClient):
         value = int(response_json['value'])
         return to, data, value
 
-    @retry(retries=3, delay=30, backoff=1.5)
+    @retry()
     async def withdraw(self) -> Optional[bool]:
+        tx = await self.prepare_withdraw()
+        if not isinstance(tx, dict):
+            return tx
+
+        tx_hash = await self.sign_transaction(tx)
+        return await self.confirm_withdraw(tx_hash)
+
+    async def prepare_withdraw(self) -> dict | bool | None:
+        """Approves the superpositions and quotes the route. Returns the withdraw tx ready for signing."""
         deposits = await self.get_deposits()
         approved = await self.set_approval(deposits)
 
@@ -234,19 +338,22 @@ class SuperForm(Account, RequestClient):
         if data == "Empty":
             return True
         tx = {
-            'chainId': await self.web3.eth.chain_id,
+            'chainId': await self.chain_state.get_chain_id(self.web3),
             'from': self.wallet_address,
             'to': self.web3.to_checksum_address(to),
-            'nonce': await self.web3.eth.get_transaction_count(self.wallet_address),
             'value': value,
-            'gasPrice': int(await self.web3.eth.gas_price * 1.2),
+            **await self.chain_state.get_fee_params(self.web3),
             'data': data
         }
-        gas = await self.web3.eth.estimate_gas(tx)
+        gas = await self.estimate_quoted_gas(tx, lambda: self.get_withdraw_data(deposits, use_cache=False))
         tx['gas'] = gas
-        tx_hash = await self.sign_transaction(tx)
+        return tx
+
+    async def confirm_withdraw(self, tx_hash: str) -> Optional[bool]:
         confirmed = await self.wait_until_tx_finished(tx_hash)
         if confirmed:
+            # The withdraw spent the allowances, so they have to be read again next time
+            known_approvals.pop(self.wallet_address, None)
             logger.success(
                 f'Successfully withdrawn all vaults | '
                 f'TX: {chain_mapping[self.withdraw_config.chain.chain_name.upper()].scan}/{tx_hash}'
@@ -254,36 +361,92 @@ class SuperForm(Account, RequestClient):
             return True
 
     async def set_approval(self, deposits) -> Optional[bool]:
-        approval_contract = self.load_contract(
-            address=PoolData.address,
-            web3=self.web3,
-            abi=PoolData.abi
-        )
         superpositions = deposits['superpositions']
         superposition_ids = [int(superposition['superposition_id']) for superposition in superpositions
                              if float(superposition['superposition_usd_value']) < WithdrawSettings.vault_max_limit]
         balances = [int(superposition['superposition_balance']) for superposition in superpositions
                     if float(superposition['superposition_usd_value']) < WithdrawSettings.vault_max_limit]
 
-        tx = await approval_contract.functions.setApprovalForMany(
-            self.web3.to_checksum_address(SuperFormData.address),
-            superposition_ids,
-            balances
-        ).build_transaction({
-            'value': 0,
-            'nonce': await self.web3.eth.get_transaction_count(self.wallet_address),
-            'from': self.wallet_address,
-            'gasPrice': int(await self.web3.eth.gas_price * 1.2)
-        })
+        missing_ids, missing_balances = await self.get_missing_approvals(superposition_ids, balances)
+        if not missing_ids:
+            logger.info(f'[{self.wallet_address}] | Superpositions are already approved')
+            return True
+
+        tx = await contracts.build_transaction(
+            self.web3,
+            PoolData.address,
+            PoolData.abi_path,
+            'setApprovalForMany',
+            [self.web3.to_checksum_address(SuperFormData.address), missing_ids, missing_balances],
+            {
+                'chainId': await self.chain_state.get_chain_id(self.web3),
+                'value': 0,
+                'from': self.wallet_address,
+                **await self.chain_state.get_fee_params(self.web3)
+            }
+        )
         tx_hash = await self.sign_transaction(tx)
         completed = await self.wait_until_tx_finished(tx_hash)
         if completed:
+            approvals = known_approvals.setdefault(self.wallet_address, {})
+            approvals.update(zip(missing_ids, missing_balances))
             logger.success(
                 f'Successfully approved spend | '
                 f'TX: {chain_mapping[self.withdraw_config.chain.chain_name].scan}/{tx_hash}'
             )
             return True
 
+    async def get_missing_approvals(
+            self,
+            superposition_ids: list[int],
+            balances: list[int]
+    ) -> tuple[list[int], list[int]]:
+        """Returns the superpositions whose approval for the SuperForm router does not cover the balance."""
+        approvals = known_approvals.setdefault(self.wallet_address, {})
+        unknown_ids = [superposition_id for superposition_id, balance in zip(superposition_ids, balances)
+                       if approvals.get(superposition_id, 0) < balance]
+
+        if unknown_ids:
+            operator = self.web3.to_checksum_address(SuperFormData.address)
+            approved_for_all, *allowances = await gather(
+                self.multicall.is_approved_for_all(self.web3, PoolData.address, self.wallet_address, operator),
+                *[
+                    self.multicall.allowance_for_id(
+                        self.web3, PoolData.address, self.wallet_address, operator, superposition_id
+                    )
+                    for superposition_id in unknown_ids
+                ]
+            )
+            if approved_for_all:
+                return [], []
+            approvals.update(zip(unknown_ids, allowances))
+
+        missing = [(superposition_id, balance) for superposition_id, balance in zip(superposition_ids, balances)
+                   if approvals.get(superposition_id, 0) < balance]
+        return [superposition_id for superposition_id, _ in missing], [balance for _, balance in missing]
+
+    def prefetch_nonce(self) -> None:
+        """Starts fetching the dynamicauth nonce now, so it is ready when the wallet's turn comes."""
+        if self.nonce_task is None and not auth_tokens.is_fresh(self.private_key):
+            self.nonce_task = create_task(self.get_nonce())
+
+    async def take_prefetched_nonce(self) -> Optional[str]:
+        """The prefetched nonce, once. A retry after it was used or failed fetches a fresh one."""
+        task, self.nonce_task = self.nonce_task, None
+        if task is None:
+            return None
+        try:
+            return await task
+        except Exception as ex:
+            logger.warning(f'[{self.wallet_address}] | Prefetched nonce failed: {ex}')
+            return None
+
+    def drop_prefetched_nonce(self) -> None:
+        """Cancels a prefetched nonce the wallet ended up not using."""
+        task, self.nonce_task = self.nonce_task, None
+        if task is not None:
+            task.cancel()
+
     async def get_nonce(self) -> str:
         response_json = await self.make_request(
             url=f'https://app.dynamicauth.com/api/v0/sdk/fb9f65d6-a8c4-4f59-8be3-c5a34a01caa5/nonce',
@@ -292,14 +455,11 @@ class SuperForm(Account, RequestClient):
         nonce = response_json['nonce']
         return nonce
 
-    def get_signature(self, nonce: str, formatted_time: str, referral_code: str) -> tuple[str, str]:
+    async def get_signature(self, nonce: str, formatted_time: str, referral_code: str) -> tuple[str, str]:
         text = f"www.superform.xyz wants you to sign in with your Ethereum account:\n{self.wallet_address}\n\nLog into Superform\n\nURI: https://www.superform.xyz/explore/?ref={referral_code}\nVersion: 1\nChain ID: 8453\nNonce: {nonce}\nIssued At: {formatted_time}\nRequest ID: fb9f65d6-a8c4-4f59-8be3-c5a34a01caa5"
 
-        signed_message = self.web3.eth.account.sign_message(
-            encode_defunct(text=text), private_key=self.private_key
-        )
-        signature = signed_message.signature.hex()
-        return '0x' + signature, text
+        signature = await signer.sign_message(text, self.private_key)
+        return signature, text
 
     async def get_auth_token(self, signature: str, msg: str):
         json_data = {
@@ -321,18 +481,28 @@ class SuperForm(Account, RequestClient):
         jwt = response_json['jwt']
         if jwt:
             logger.success(f'[{self.wallet_address}] | Successfully grabbed auth token')
-            self.headers.update({'sf-jwt': jwt})
-            return True
-        return False
-
-    @retry(retries=3, delay=30, backoff=1.5)
+            return jwt
+
+    async def authenticate(self, referral_code: str) -> bool:
+        """Puts an sf-jwt into the headers, logging in only if the wallet has no saved token that is still fresh."""
+        async with auth_tokens.lock(self.private_key):
+            auth_token = await auth_tokens.get(self.private_key)
+            if auth_token is None:
+                nonce = await self.take_prefetched_nonce() or await self.get_nonce()
+                current_time = datetime.now(timezone.utc)
+                formatted_time = current_time.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+                signature, msg = await self.get_signature(nonce, formatted_time, referral_code)
+                auth_token = await self.get_auth_token(signature, msg)
+                if not auth_token:
+                    return False
+                auth_tokens.put(self.private_key, auth_token)
+
+        self.headers.update({'sf-jwt': auth_token})
+        return True
+
+    @retry()
     async def register_referral(self, referral_code: str):
-        nonce = await self.get_nonce()
-        current_time = datetime.now(timezone.utc)
-        formatted_time = current_time.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-        signature, msg = self.get_signature(nonce, formatted_time, referral_code)
-        auth_token = await self.get_auth_token(signature, msg)
-        if not auth_token:
+        if not await self.authenticate(referral_code):
             logger.error(f'[{self.wallet_address}] | Failed to get auth token.')
             return
 
@@ -340,6 +510,10 @@ class SuperForm(Account, RequestClient):
             url=f'https://www.superform.xyz/api/proxy/superrewards/referrals/redeem/{referral_code}/',
             headers=self.headers
         )
+        if response_json is None:
+            # Possibly an expired or revoked token, so the retry logs in again
+            auth_tokens.invalidate(self.private_key)
+            raise RuntimeError(f'Failed to redeem referral code {referral_code}')
         if response_json['success']:
             logger.success(f'[{self.wallet_address}] | Successfully added referral')
             return True
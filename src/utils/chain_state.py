@@ -0,0 +1,136 @@
+from asyncio import Task, create_task, shield
+from time import monotonic
+from statistics import median
+from typing import Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+from web3 import AsyncWeb3
+from web3.exceptions import MethodUnavailable
+
+from loguru import logger
+
+from config import (
+    GAS_PRICE_TTL,
+    FEE_REFRESH_INTERVAL,
+    FEE_HISTORY_BLOCKS,
+    FEE_PRIORITY_PERCENTILE,
+    FEE_BASE_MULTIPLIER,
+    FEE_MIN_PRIORITY,
+)
+from src.utils.data.chains import Chain, chain_mapping
+
+T = TypeVar('T')
+
+
+class CachedValue(Generic[T]):
+    """Keeps the result of an async fetch for `ttl` seconds (forever if ttl is None).
+
+    Concurrent callers that miss the cache share one in-flight fetch instead of sending their own.
+    The fetch runs in its own task, so a cancelled caller does not leave the others waiting on it.
+    """
+
+    def __init__(self, ttl: float | None) -> None:
+        self.ttl = ttl
+        self._value: Optional[T] = None
+        self._expires_at: float = 0
+        self._has_value = False
+        self._pending: Optional[Task] = None
+
+    def is_fresh(self) -> bool:
+        return self._has_value and (self.ttl is None or monotonic() < self._expires_at)
+
+    def invalidate(self) -> None:
+        self._has_value = False
+
+    def set(self, value: T) -> None:
+        self._value = value
+        self._has_value = True
+        if self.ttl is not None:
+            self._expires_at = monotonic() + self.ttl
+
+    async def get(self, fetch: Callable[[], Awaitable[T]]) -> T:
+        if self.is_fresh():
+            return self._value
+
+        if self._pending is None:
+            self._pending = create_task(self._fetch(fetch))
+            self._pending.add_done_callback(self._discard_pending)
+        return await shield(self._pending)
+
+    async def _fetch(self, fetch: Callable[[], Awaitable[T]]) -> T:
+        value = await fetch()
+        self.set(value)
+        return value
+
+    def _discard_pending(self, task: Task) -> None:
+        if self._pending is task:
+            self._pending = None
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled
+            task.exception()
+
+
+class ChainState:
+    """Chain-wide values shared by every wallet on the chain."""
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self._chain_id: CachedValue[int] = CachedValue(ttl=None)
+        self._gas_price: CachedValue[int] = CachedValue(ttl=GAS_PRICE_TTL)
+        self._base_fee: CachedValue[int] = CachedValue(ttl=GAS_PRICE_TTL)
+        self._fees: CachedValue[Dict[str, int]] = CachedValue(ttl=FEE_REFRESH_INTERVAL)
+        self._supports_eip1559 = True
+
+    async def get_chain_id(self, web3: AsyncWeb3) -> int:
+        return await self._chain_id.get(lambda: web3.eth.chain_id)
+
+    async def get_gas_price(self, web3: AsyncWeb3) -> int:
+        return await self._gas_price.get(lambda: web3.eth.gas_price)
+
+    async def get_base_fee(self, web3: AsyncWeb3) -> int:
+        async def fetch_base_fee() -> int:
+            block = await web3.eth.get_block('latest')
+            return block['baseFeePerGas']
+
+        return await self._base_fee.get(fetch_base_fee)
+
+    async def get_fee_params(self, web3: AsyncWeb3) -> Dict[str, int]:
+        """Fee fields for a new transaction, shared by every wallet on the chain until the next refresh.
+
+        `maxPriorityFeePerGas` is the FEE_PRIORITY_PERCENTILE tip over the last FEE_HISTORY_BLOCKS blocks and
+        `maxFeePerGas` leaves room for the next base fee to grow FEE_BASE_MULTIPLIER times.
+        Chains without `eth_feeHistory` fall back to the legacy gas price.
+        """
+        if not self._supports_eip1559:
+            return {'gasPrice': int(await self.get_gas_price(web3) * 1.2)}
+
+        try:
+            return dict(await self._fees.get(lambda: self._fetch_fee_params(web3)))
+        except (MethodUnavailable, KeyError) as ex:
+            logger.warning(f'eth_feeHistory is not available, using legacy gas price | {ex}')
+            self._supports_eip1559 = False
+            return await self.get_fee_params(web3)
+
+    async def _fetch_fee_params(self, web3: AsyncWeb3) -> Dict[str, int]:
+        fee_history = await web3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [FEE_PRIORITY_PERCENTILE])
+        next_base_fee = fee_history['baseFeePerGas'][-1]
+        rewards = [reward[0] for reward in fee_history['reward'] if reward]
+        priority_fee = max(int(median(rewards)) if rewards else 0, FEE_MIN_PRIORITY)
+
+        self._base_fee.set(next_base_fee)
+        return {
+            'maxFeePerGas': int(next_base_fee * FEE_BASE_MULTIPLIER) + priority_fee,
+            'maxPriorityFeePerGas': priority_fee,
+        }
+
+    def invalidate_fees(self) -> None:
+        self._fees.invalidate()
+        self._base_fee.invalidate()
+
+
+chain_states: Dict[str, ChainState] = {
+    chain_name: ChainState(chain) for chain_name, chain in chain_mapping.items()
+}
+
+
+def get_chain_state(chain_name: str) -> ChainState:
+    return chain_states[chain_name.upper()]
@@ -0,0 +1,106 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import AsyncWeb3
+from web3.contract import AsyncContract
+
+
+def _abi_type(param: Dict[str, Any]) -> str:
+    if param['type'].startswith('tuple'):
+        return f"({','.join(_abi_type(component) for component in param['components'])}){param['type'][5:]}"
+    return param['type']
+
+
+@dataclass(frozen=True)
+class ContractFunction:
+    name: str
+    signature: str
+    selector: bytes
+    input_types: Tuple[str, ...]
+    output_types: Tuple[str, ...]
+
+    def encode(self, *args: Any) -> bytes:
+        return self.selector + encode(self.input_types, args)
+
+    def decode(self, data: bytes) -> Tuple:
+        return decode(self.output_types, data)
+
+
+class ContractABI:
+    """An ABI file parsed once, with the selector and argument types of every function worked out ahead."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'r') as file:
+            self.abi = json.load(file)
+
+        self.functions: Dict[str, ContractFunction] = {}
+        for entry in self.abi:
+            if entry.get('type') != 'function':
+                continue
+            input_types = tuple(_abi_type(param) for param in entry.get('inputs', []))
+            signature = f"{entry['name']}({','.join(input_types)})"
+            function = ContractFunction(
+                name=entry['name'],
+                signature=signature,
+                selector=function_signature_to_4byte_selector(signature),
+                input_types=input_types,
+                output_types=tuple(_abi_type(param) for param in entry.get('outputs', []))
+            )
+            # Overloads are reachable by their full signature, the bare name points at the first one
+            self.functions[signature] = function
+            self.functions.setdefault(entry['name'], function)
+
+    def function(self, name: str) -> ContractFunction:
+        return self.functions[name]
+
+
+class ContractRegistry:
+    """Parses every ABI once and keeps the web3 contract objects built from it.
+
+    Contract objects are cached per web3 instance and address, so a wallet builds each of them at most once.
+    Hot paths should prefer `build_transaction`, which only needs the precomputed selectors.
+    """
+
+    def __init__(self) -> None:
+        self._abis: Dict[str, ContractABI] = {}
+        self._contracts: WeakKeyDictionary[AsyncWeb3, Dict[Tuple[str, str], AsyncContract]] = WeakKeyDictionary()
+
+    def abi(self, path: str) -> ContractABI:
+        if path not in self._abis:
+            self._abis[path] = ContractABI(path)
+        return self._abis[path]
+
+    def contract(self, web3: AsyncWeb3, address: str, abi_path: str) -> AsyncContract:
+        address = web3.to_checksum_address(address)
+        contracts = self._contracts.setdefault(web3, {})
+        key = (abi_path, address)
+        if key not in contracts:
+            contracts[key] = web3.eth.contract(address=address, abi=self.abi(abi_path).abi)
+        return contracts[key]
+
+    async def build_transaction(
+            self,
+            web3: AsyncWeb3,
+            address: str,
+            abi_path: str,
+            function_name: str,
+            args: Sequence[Any],
+            params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Same result as `contract.functions.<name>(*args).build_transaction(params)` without a contract object."""
+        tx = {
+            'value': 0,
+            **params,
+            'to': web3.to_checksum_address(address),
+            'data': self.abi(abi_path).function(function_name).encode(*args),
+        }
+        if 'gas' not in tx:
+            tx['gas'] = await web3.eth.estimate_gas(tx)
+        return tx
+
+
+contracts = ContractRegistry()
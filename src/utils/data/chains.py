@@ -1,35 +1,55 @@
+from typing import List
+
+
 class Chain:
-    def __init__(self, chain_id: int, rpc: str, scan: str, native_token: str) -> None:
+    def __init__(self, chain_id: int, rpc: str | List[str], scan: str, native_token: str) -> None:
         self.chain_id = chain_id
-        self.rpc = rpc
+        self.rpcs = [rpc] if isinstance(rpc, str) else list(rpc)
+        self.rpc = self.rpcs[0]
         self.scan = scan
         self.native_token = native_token
 
 
 ETH = Chain(
     chain_id=1,
-    rpc='https://rpc.ankr.com/eth',
+    rpc=[
+        'https://rpc.ankr.com/eth',
+        'https://eth.llamarpc.com',
+        'https://ethereum-rpc.publicnode.com',
+    ],
     scan='https://etherscan.io/tx',
     native_token='ETH',
 )
 
 ARB = Chain(
     chain_id=42161,
-    rpc='https://arb1.arbitrum.io/rpc',
+    rpc=[
+        'https://arb1.arbitrum.io/rpc',
+        'https://arbitrum.llamarpc.com',
+        'https://arbitrum-one-rpc.publicnode.com',
+    ],
     scan='https://arbiscan.io/tx',
     native_token='ETH',
 )
 
 OP = Chain(
     chain_id=10,
-    rpc='https://op-pokt.nodies.app',
+    rpc=[
+        'https://op-pokt.nodies.app',
+        'https://mainnet.optimism.io',
+        'https://optimism-rpc.publicnode.com',
+    ],
     scan='https://optimistic.etherscan.io/tx',
     native_token='ETH',
 )
 
 BASE = Chain(
     chain_id=8453,
-    rpc='https://base.meowrpc.com',
+    rpc=[
+        'https://base.meowrpc.com',
+        'https://mainnet.base.org',
+        'https://base-rpc.publicnode.com',
+    ],
     scan='https://basescan.org/tx',
     native_token='ETH'
 )
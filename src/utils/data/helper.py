@@ -1,17 +1,22 @@
+from functools import lru_cache
+
 from colorama import Fore
 
-with open('config.py', 'r', encoding='utf-8-sig') as file:
-    module_config = file.read()
 
-exec(module_config)
+@lru_cache(maxsize=None)
+def load_private_keys() -> list[str]:
+    with open('wallets.txt', 'r', encoding='utf-8-sig') as file:
+        private_keys = [line.strip() for line in file]
+
+    print(Fore.BLUE + f'Loaded {len(private_keys)} wallets:')
+    print('\033[39m')
+    return private_keys
 
-with open('wallets.txt', 'r', encoding='utf-8-sig') as file:
-    private_keys = [line.strip() for line in file]
 
-with open('proxies.txt', 'r', encoding='utf-8-sig') as file:
-    proxies = [line.strip() for line in file]
-    if not proxies:
-        proxies = [None for _ in range(len(private_keys))]
+@lru_cache(maxsize=None)
+def load_proxies() -> list[str | None]:
+    with open('proxies.txt', 'r', encoding='utf-8-sig') as file:
+        proxies = [line.strip() for line in file]
 
-print(Fore.BLUE + f'Loaded {len(private_keys)} wallets:')
-print('\033[39m')
+    # Without proxies every wallet goes out directly
+    return proxies or [None]
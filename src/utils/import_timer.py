@@ -0,0 +1,24 @@
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator, List, Tuple
+
+from loguru import logger
+
+import_times: List[Tuple[str, float, int]] = []
+
+
+@contextmanager
+def timed_imports(name: str) -> Iterator[None]:
+    """Records how long the imports inside the block took and how many modules they loaded."""
+    loaded_before = len(sys.modules)
+    started_at = perf_counter()
+    yield
+    import_times.append((name, perf_counter() - started_at, len(sys.modules) - loaded_before))
+
+
+def report_import_times() -> None:
+    total = sum(elapsed for _, elapsed, _ in import_times)
+    for name, elapsed, modules in import_times:
+        logger.info(f'Import | {name}: {elapsed * 1000:.0f}ms ({modules} modules)')
+    logger.info(f'Import | Total: {total * 1000:.0f}ms')
@@ -1,16 +1,8 @@
-from src.database.base_models.pydantic_manager import DataBaseManagerConfig
-from src.database.utils.db_manager import DataBaseUtils
+from src.database.utils.status_writer import status_writer
 
+# Module 3 progress lives next to the route tasks, a new route database keeps it
+REFERRAL_TASK = 'REFERRAL'
 
-async def manage_tasks(private_key: str, task: str) -> None:
-    db_utils = DataBaseUtils(
-        manager_config=DataBaseManagerConfig(
-            action='wallets_tasks'
-        )
-    )
 
-    await db_utils.add_to_db(
-        private_key=private_key,
-        task_name=task,
-        status='completed'
-    )
+async def manage_tasks(private_key: str, task: str) -> None:
+    status_writer.put(private_key, task, status='completed')
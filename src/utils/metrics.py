@@ -0,0 +1,223 @@
+import json
+import os
+from asyncio import Task, create_task, gather, sleep
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from time import monotonic, perf_counter
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from config import METRICS_INTERVAL, METRICS_FILE, METRICS_JSON_FILE, METRICS_PORT, METRICS_WINDOW
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = 'superform'
+
+
+def endpoint_label(url: str | None) -> str:
+    """Host of a URL, so every path of one API shares a label."""
+    if not url:
+        return ''
+    return urlparse(url).netloc or url
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(str(value))}"' for name, value in labels.items()) + '}'
+
+
+class LatencySummary:
+    """Count, total and error count of one stage and endpoint, with the last `window` timings for quantiles."""
+
+    def __init__(self, window: int) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, elapsed: float, ok: bool) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.samples.append(elapsed)
+        if not ok:
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Metrics:
+    """Latency of every stage of a run (Superform API, RPC, signing, confirmations, SQLite...) and counters.
+
+    Timings are keyed by stage and endpoint, and quantiles cover the last METRICS_WINDOW timings of each.
+    Every METRICS_INTERVAL seconds the numbers are written to METRICS_FILE in the Prometheus text format
+    and to METRICS_JSON_FILE as a snapshot. With METRICS_PORT they are also served at /metrics.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self.window = window
+        self.started_at = monotonic()
+        self._latencies: Dict[Tuple[str, str], LatencySummary] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        self._writer: Optional[Task] = None
+        self._server: Any = None
+
+    def observe(self, stage: str, endpoint: str, elapsed: float, ok: bool = True) -> None:
+        key = (stage, endpoint)
+        if key not in self._latencies:
+            self._latencies[key] = LatencySummary(self.window)
+        self._latencies[key].observe(elapsed, ok)
+
+    @contextmanager
+    def timer(self, stage: str, endpoint: str = '') -> Iterator[None]:
+        """Times the block. A block that raises counts as an error of its stage and endpoint."""
+        started_at = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, endpoint, perf_counter() - started_at, ok=False)
+            raise
+        self.observe(stage, endpoint, perf_counter() - started_at)
+
+    def timed(self, stage: str) -> Callable:
+        """Decorator for coroutines that times every call, with the function name as the endpoint."""
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            async def wrapped(*args: Any, **kwargs: Any) -> Any:
+                with self.timer(stage, func.__name__):
+                    return await func(*args, **kwargs)
+
+            return wrapped
+
+        return decorator
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Sum of the counter over every label set that contains `labels`."""
+        return sum(
+            value for (counter_name, counter_labels), value in self._counters.items()
+            if counter_name == name and set(labels.items()) <= set(counter_labels)
+        )
+
+    @property
+    def wallets_per_minute(self) -> float:
+        minutes = (monotonic() - self.started_at) / 60
+        return self.counter('wallets', outcome='completed') / minutes if minutes else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for (stage, endpoint), summary in sorted(self._latencies.items()):
+            stages[stage][endpoint] = {
+                'count': summary.count,
+                'errors': summary.errors,
+                'avg': summary.total / summary.count if summary.count else None,
+                **{f'p{round(q * 100)}': summary.quantile(q) for q in QUANTILES},
+            }
+
+        counters: Dict[str, list] = defaultdict(list)
+        for (name, labels), value in sorted(self._counters.items()):
+            counters[name].append({**dict(labels), 'value': value})
+
+        return {
+            'uptime': monotonic() - self.started_at,
+            'wallets_per_minute': self.wallets_per_minute,
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def render_prometheus(self) -> str:
+        name = f'{PREFIX}_stage_latency_seconds'
+        lines = [
+            f'# HELP {name} Latency of each stage and endpoint over the last {self.window} calls.',
+            f'# TYPE {name} summary',
+        ]
+        for (stage, endpoint), summary in sorted(self._latencies.items()):
+            labels = {'stage': stage, 'endpoint': endpoint}
+            for q in QUANTILES:
+                value = summary.quantile(q)
+                if value is not None:
+                    lines.append(f'{name}{format_labels({**labels, "quantile": str(q)})} {value:.6f}')
+            lines.append(f'{name}_sum{format_labels(labels)} {summary.total:.6f}')
+            lines.append(f'{name}_count{format_labels(labels)} {summary.count}')
+
+        errors = f'{PREFIX}_stage_errors_total'
+        lines += [f'# HELP {errors} Calls of each stage and endpoint that raised.', f'# TYPE {errors} counter']
+        for (stage, endpoint), summary in sorted(self._latencies.items()):
+            lines.append(f'{errors}{format_labels({"stage": stage, "endpoint": endpoint})} {summary.errors}')
+
+        for counter_name in sorted({counter_name for counter_name, _ in self._counters}):
+            total = f'{PREFIX}_{counter_name}_total'
+            lines.append(f'# TYPE {total} counter')
+            for (name, labels), value in sorted(self._counters.items()):
+                if name == counter_name:
+                    lines.append(f'{total}{format_labels(dict(labels))} {value:g}')
+
+        rate = f'{PREFIX}_wallets_per_minute'
+        lines += [f'# TYPE {rate} gauge', f'{rate} {self.wallets_per_minute:.3f}']
+        return '\n'.join(lines) + '\n'
+
+    def write_files(self) -> None:
+        for path, content in (
+                (METRICS_FILE, self.render_prometheus()),
+                (METRICS_JSON_FILE, json.dumps(self.snapshot(), indent=2)),
+        ):
+            if not path:
+                continue
+            try:
+                # Written aside and moved over, so a scraper never reads half a file
+                with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+                    file.write(content)
+                os.replace(f'{path}.tmp', path)
+            except OSError as ex:
+                logger.error(f'Failed to write metrics to {path}: {ex}')
+
+    async def start(self) -> None:
+        if METRICS_INTERVAL and (self._writer is None or self._writer.done()):
+            self._writer = create_task(self._write_loop())
+        if METRICS_PORT and self._server is None:
+            from aiohttp import web
+
+            async def handle_metrics(request: web.Request) -> web.Response:
+                return web.Response(text=self.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+            async def handle_snapshot(request: web.Request) -> web.Response:
+                return web.json_response(self.snapshot())
+
+            app = web.Application()
+            app.router.add_get('/metrics', handle_metrics)
+            app.router.add_get('/metrics.json', handle_snapshot)
+            self._server = web.AppRunner(app, access_log=None)
+            await self._server.setup()
+            await web.TCPSite(self._server, '127.0.0.1', METRICS_PORT).start()
+            logger.info(f'Metrics are served at http://127.0.0.1:{METRICS_PORT}/metrics')
+
+    async def _write_loop(self) -> None:
+        while True:
+            await sleep(METRICS_INTERVAL)
+            self.write_files()
+
+    async def close(self) -> None:
+        """Stops the export and writes the final numbers. Called on shutdown."""
+        if self._writer is not None:
+            self._writer.cancel()
+            await gather(self._writer, return_exceptions=True)
+            self._writer = None
+            self.write_files()
+        if self._server is not None:
+            await self._server.cleanup()
+            self._server = None
+
+
+metrics = Metrics()
@@ -0,0 +1,146 @@
+from asyncio import Future, Task, TimerHandle, create_task, get_running_loop
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from loguru import logger
+from web3 import AsyncWeb3
+
+from config import MULTICALL_WINDOW, MULTICALL_MAX_BATCH
+
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+AGGREGATE3 = function_signature_to_4byte_selector('aggregate3((address,bool,bytes)[])')
+GET_ETH_BALANCE = function_signature_to_4byte_selector('getEthBalance(address)')
+BALANCE_OF = function_signature_to_4byte_selector('balanceOf(address)')
+DECIMALS = function_signature_to_4byte_selector('decimals()')
+ALLOWANCE = function_signature_to_4byte_selector('allowance(address,address)')
+ALLOWANCE_FOR_ID = function_signature_to_4byte_selector('allowance(address,address,uint256)')
+IS_APPROVED_FOR_ALL = function_signature_to_4byte_selector('isApprovedForAll(address,address)')
+
+
+@dataclass
+class _Call:
+    target: str
+    call_data: bytes
+    output_types: Sequence[str]
+    future: Future
+
+
+class MulticallBatcher:
+    """Collects read-only calls from every wallet on a chain and sends them as Multicall3 `aggregate3` calls.
+
+    A batch is flushed after MULTICALL_WINDOW seconds or as soon as it holds MULTICALL_MAX_BATCH calls.
+    """
+
+    def __init__(self, chain_name: str) -> None:
+        self.chain_name = chain_name
+        self._pending: List[_Call] = []
+        self._web3: Optional[AsyncWeb3] = None
+        self._timer: Optional[TimerHandle] = None
+        self._decimals: Dict[str, int] = {}
+        self._in_flight: Set[Task] = set()
+
+    async def call(
+            self,
+            web3: AsyncWeb3,
+            target: str,
+            call_data: bytes,
+            output_types: Sequence[str]
+    ) -> Tuple:
+        loop = get_running_loop()
+        call = _Call(
+            target=web3.to_checksum_address(target),
+            call_data=call_data,
+            output_types=output_types,
+            future=loop.create_future()
+        )
+        self._pending.append(call)
+        self._web3 = web3
+
+        if len(self._pending) >= MULTICALL_MAX_BATCH:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(MULTICALL_WINDOW, self._flush)
+
+        return await call.future
+
+    async def native_balance(self, web3: AsyncWeb3, owner: str) -> int:
+        (balance,) = await self.call(
+            web3, MULTICALL3_ADDRESS, GET_ETH_BALANCE + encode(['address'], [owner]), ['uint256']
+        )
+        return balance
+
+    async def balance_of(self, web3: AsyncWeb3, token: str, owner: str) -> int:
+        (balance,) = await self.call(web3, token, BALANCE_OF + encode(['address'], [owner]), ['uint256'])
+        return balance
+
+    async def decimals(self, web3: AsyncWeb3, token: str) -> int:
+        token = token.lower()
+        if token not in self._decimals:
+            (self._decimals[token],) = await self.call(web3, token, DECIMALS, ['uint8'])
+        return self._decimals[token]
+
+    async def allowance(self, web3: AsyncWeb3, token: str, owner: str, spender: str) -> int:
+        (amount,) = await self.call(
+            web3, token, ALLOWANCE + encode(['address', 'address'], [owner, spender]), ['uint256']
+        )
+        return amount
+
+    async def allowance_for_id(self, web3: AsyncWeb3, token: str, owner: str, operator: str, token_id: int) -> int:
+        (amount,) = await self.call(
+            web3, token, ALLOWANCE_FOR_ID + encode(['address', 'address', 'uint256'], [owner, operator, token_id]),
+            ['uint256']
+        )
+        return amount
+
+    async def is_approved_for_all(self, web3: AsyncWeb3, token: str, owner: str, operator: str) -> bool:
+        (approved,) = await self.call(
+            web3, token, IS_APPROVED_FOR_ALL + encode(['address', 'address'], [owner, operator]), ['bool']
+        )
+        return approved
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = create_task(self._execute(self._web3, batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, web3: AsyncWeb3, batch: List[_Call]) -> None:
+        calls = [(call.target, True, call.call_data) for call in batch]
+        try:
+            raw_result = await web3.eth.call({
+                'to': MULTICALL3_ADDRESS,
+                'data': AGGREGATE3 + encode(['(address,bool,bytes)[]'], [calls])
+            })
+            (results,) = decode(['(bool,bytes)[]'], raw_result)
+        except Exception as ex:
+            logger.warning(f'{self.chain_name} | Multicall of {len(batch)} calls failed: {ex}')
+            for call in batch:
+                if not call.future.done():
+                    call.future.set_exception(ex)
+            return
+
+        for call, (success, return_data) in zip(batch, results):
+            if call.future.done():
+                continue
+            if not success or not return_data:
+                call.future.set_exception(ValueError(f'Call to {call.target} reverted'))
+                continue
+            call.future.set_result(decode(call.output_types, return_data))
+
+
+multicall_batchers: Dict[str, MulticallBatcher] = {}
+
+
+def get_multicall(chain_name: str) -> MulticallBatcher:
+    chain_name = chain_name.upper()
+    if chain_name not in multicall_batchers:
+        multicall_batchers[chain_name] = MulticallBatcher(chain_name)
+    return multicall_batchers[chain_name]
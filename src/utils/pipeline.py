@@ -0,0 +1,197 @@
+from asyncio import Future, Queue, Task, create_task, gather, get_running_loop, sleep, CancelledError
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from src.superform.superform import SuperForm
+from src.utils.metrics import metrics
+from src.utils.wrappers.retry_policy import RetryPolicy, classify_error, default_policy
+
+
+@dataclass
+class Job:
+    """One wallet task moving through the pipeline. `payload` carries the output of the previous stage.
+
+    `sent` resolves once the transaction is sent (or the job ends without sending one), `future` once it is done.
+    """
+    superform: SuperForm
+    prepare: Callable[[], Awaitable[Any]]
+    confirm: Callable[[str], Awaitable[Optional[bool]]]
+    future: Future
+    sent: Future
+    on_done: Optional[Callable[[Optional[bool]], Awaitable[None]]] = None
+    attempt: int = 0
+    payload: Any = None
+
+
+@dataclass
+class Stage:
+    name: str
+    handler: Callable[[Job], Awaitable[bool]]
+    workers: int
+    queue: Queue = field(init=False)
+    busy: int = 0
+
+    def __post_init__(self) -> None:
+        self.queue = Queue()
+
+
+class Pipeline:
+    """Runs wallet tasks as prepare -> submit -> confirm stages with a fixed set of workers per stage.
+
+    Every stage hands its jobs to the next one through a bounded queue, so prepare workers keep
+    reading balances and quoting routes for the next wallets while earlier transactions confirm.
+    A job that fails before its transaction is sent goes back to the prepare stage after the delay chosen
+    by the retry policy. Once it is sent, failures only repeat the confirm stage on the same hash,
+    since preparing again would send a second transaction.
+    With `submit` the caller moves on as soon as its transaction is sent, and the confirm stage finishes the job.
+    """
+
+    def __init__(
+            self,
+            *,
+            prepare_workers: int,
+            submit_workers: int,
+            confirm_workers: int,
+            queue_size: int,
+            stats_interval: float = 0,
+            policy: RetryPolicy = default_policy
+    ) -> None:
+        self.policy = policy
+        self.stats_interval = stats_interval
+
+        self.prepare_stage = Stage('prepare', self._prepare, prepare_workers)
+        self.submit_stage = Stage('submit', self._submit, submit_workers)
+        self.confirm_stage = Stage('confirm', self._confirm, confirm_workers)
+        self.stages = [self.prepare_stage, self.submit_stage, self.confirm_stage]
+        for stage in self.stages[1:]:
+            stage.queue = Queue(maxsize=queue_size)
+
+        self._workers: List[Task] = []
+        self._delayed: Set[Task] = set()
+
+    def stats(self) -> Dict[str, str]:
+        return {stage.name: f'{stage.queue.qsize()} queued/{stage.busy} busy' for stage in self.stages}
+
+    def start(self) -> None:
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for _ in range(max(1, stage.workers)):
+                self._workers.append(create_task(self._worker(stage, next_stage)))
+        if self.stats_interval:
+            self._workers.append(create_task(self._report()))
+
+    async def close(self) -> None:
+        for task in self._workers + list(self._delayed):
+            task.cancel()
+        await gather(*self._workers, *self._delayed, return_exceptions=True)
+        self._workers.clear()
+
+    async def run(
+            self,
+            superform: SuperForm,
+            prepare: Callable[[], Awaitable[Any]],
+            confirm: Callable[[str], Awaitable[Optional[bool]]]
+    ) -> Optional[bool]:
+        """Queues one task and waits until it is confirmed, skipped or out of retries."""
+        job = await self._queue(superform, prepare, confirm)
+        return await job.future
+
+    async def submit(
+            self,
+            superform: SuperForm,
+            prepare: Callable[[], Awaitable[Any]],
+            confirm: Callable[[str], Awaitable[Optional[bool]]],
+            on_done: Callable[[Optional[bool]], Awaitable[None]]
+    ) -> None:
+        """Queues one task and waits only until its transaction is sent. `on_done` gets the final result."""
+        job = await self._queue(superform, prepare, confirm, on_done)
+        await job.sent
+
+    async def _queue(
+            self,
+            superform: SuperForm,
+            prepare: Callable[[], Awaitable[Any]],
+            confirm: Callable[[str], Awaitable[Optional[bool]]],
+            on_done: Optional[Callable[[Optional[bool]], Awaitable[None]]] = None
+    ) -> Job:
+        loop = get_running_loop()
+        job = Job(
+            superform=superform, prepare=prepare, confirm=confirm,
+            future=loop.create_future(), sent=loop.create_future(), on_done=on_done
+        )
+        await self.prepare_stage.queue.put(job)
+        return job
+
+    async def _finish(self, job: Job, result: Optional[bool]) -> None:
+        if job.on_done is not None:
+            try:
+                await job.on_done(result)
+            except Exception as ex:
+                logger.error(f'{ex} | on_done')
+        if not job.sent.done():
+            job.sent.set_result(None)
+        job.future.set_result(result)
+
+    async def _prepare(self, job: Job) -> bool:
+        tx = await job.prepare()
+        if not isinstance(tx, dict):
+            # Nothing to send: a zero balance, no route or no positions left
+            await self._finish(job, tx)
+            return False
+        job.payload = tx
+        return True
+
+    async def _submit(self, job: Job) -> bool:
+        job.payload = await job.superform.sign_transaction(job.payload)
+        if not job.sent.done():
+            job.sent.set_result(None)
+        return True
+
+    async def _confirm(self, job: Job) -> bool:
+        await self._finish(job, await job.confirm(job.payload))
+        return False
+
+    async def _worker(self, stage: Stage, next_stage: Optional[Stage]) -> None:
+        while True:
+            job = await stage.queue.get()
+            stage.busy += 1
+            try:
+                if await stage.handler(job) and next_stage is not None:
+                    await next_stage.queue.put(job)
+            except CancelledError:
+                raise
+            except Exception as ex:
+                await self._retry(job, stage, ex)
+            finally:
+                stage.busy -= 1
+                stage.queue.task_done()
+
+    async def _retry(self, job: Job, stage: Stage, ex: Exception) -> None:
+        delay = self.policy.next_delay(ex, job.attempt)
+        if delay is None:
+            metrics.inc('failures', function=stage.name, kind=classify_error(ex).value)
+            logger.error(f'{ex} | {stage.name}')
+            await self._finish(job, None)
+            return
+        metrics.inc('retries', function=stage.name, kind=classify_error(ex).value)
+
+        job.attempt += 1
+        if stage is self.confirm_stage:
+            retry_stage = self.confirm_stage
+        else:
+            retry_stage = self.prepare_stage
+            job.payload = None
+        task = create_task(self._requeue(job, retry_stage, delay))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def _requeue(self, job: Job, stage: Stage, delay: float) -> None:
+        await sleep(delay)
+        await stage.queue.put(job)
+
+    async def _report(self) -> None:
+        while True:
+            await sleep(self.stats_interval)
+            logger.info('Pipeline | ' + ' | '.join(f'{name}: {value}' for name, value in self.stats().items()))
@@ -1,8 +1,29 @@
-from aiohttp import ClientSession
-from asyncio import sleep
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout
+from aiohttp_socks import ProxyConnectionError, ProxyError, ProxyTimeoutError
+from asyncio import Task, TimeoutError, create_task, gather, shield, sleep
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
 
 from loguru import logger
 
+from config import (
+    MOBILE_PROXY,
+    ROTATE_IP,
+    MAX_WALLETS_PER_PROXY,
+    PROXY_CHECK_URL,
+    PROXY_CHECK_INTERVAL,
+    PROXY_MAX_FAILURES,
+    PROXY_QUARANTINE_SECONDS,
+    PROXY_ROTATE_ATTEMPTS,
+)
+from src.utils.metrics import endpoint_label, metrics
+from src.utils.request_client.session_pool import sessions
+
+T = TypeVar('T')
+
+# Errors that point at the proxy itself rather than at the host behind it
+PROXY_ERRORS = (ProxyError, ProxyConnectionError, ProxyTimeoutError, ClientConnectionError, TimeoutError)
+
 
 class Proxy:
     def __init__(
@@ -13,18 +34,185 @@ class Proxy:
         self.proxy_url = proxy_url
         self.change_link = change_link
 
-    async def change_ip(self) -> None:
-        while True:
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.failures = 0
+        self.quarantined_until = 0.0
+        self.rotation: Optional[Task] = None
+        self.users = 0
+
+    @property
+    def is_healthy(self) -> bool:
+        return monotonic() >= self.quarantined_until
+
+    @property
+    def is_rotating(self) -> bool:
+        return self.rotation is not None and not self.rotation.done()
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.success_rate += 0.2 * ((1.0 if ok else 0.0) - self.success_rate)
+        if ok:
+            self.failures = 0
+            self.latency = elapsed if self.latency is None else self.latency + 0.2 * (elapsed - self.latency)
+            return
+
+        self.failures += 1
+        if self.failures >= PROXY_MAX_FAILURES and self.is_healthy:
+            logger.warning(
+                f'Proxy {self.proxy_url.split("@")[-1]} failed {self.failures} times in a row, '
+                f'quarantined for {PROXY_QUARANTINE_SECONDS}s'
+            )
+            self.quarantined_until = monotonic() + PROXY_QUARANTINE_SECONDS
+
+    async def change_ip(self) -> bool:
+        with metrics.timer('proxy_rotate', endpoint_label(self.proxy_url)):
+            return await self._change_ip()
+
+    async def _change_ip(self) -> bool:
+        for attempt in range(PROXY_ROTATE_ATTEMPTS):
             try:
-                async with ClientSession() as session:
+                async with ClientSession(timeout=ClientTimeout(total=30)) as session:
                     response = await session.get(self.change_link)
-                    if response.status != 200:
-                        logger.error(f'Failed to change ip')
-                        continue
-                    # logger.success('Successfully changed ip')
-                    break
+                    if response.status == 200:
+                        return True
+                    logger.error(f'Failed to change ip | Status: {response.status}')
 
             except Exception as ex:
-                logger.error(ex)
-                await sleep(4)
-                continue
+                logger.error(f'Failed to change ip | {ex}')
+
+            await sleep(min(2 ** attempt, 30))
+
+        logger.error(f'Gave up changing ip after {PROXY_ROTATE_ATTEMPTS} attempts')
+        return False
+
+    def rotate_in_background(self) -> None:
+        if self.change_link and (self.rotation is None or self.rotation.done()):
+            self.rotation = create_task(self.change_ip())
+
+    async def wait_rotation(self) -> None:
+        if self.is_rotating:
+            await shield(self.rotation)
+
+
+class ProxyPool:
+    """Every proxy in use, shared by the wallets assigned to it, with their health.
+
+    Requests report their outcome through `call`, and a background check hits PROXY_CHECK_URL through
+    every proxy. A proxy that fails PROXY_MAX_FAILURES times in a row is quarantined, and wallets
+    assigned to it borrow the healthiest other proxy until the quarantine is over, preferably one
+    with fewer than MAX_WALLETS_PER_PROXY wallets on it. The cap itself is enforced by the WorkerPool.
+    Wallets using a proxy are counted, borrowers included, and mobile proxies change their IP
+    in the background as soon as the last wallet on them is done.
+    """
+
+    def __init__(self, max_users: int = MAX_WALLETS_PER_PROXY) -> None:
+        self.max_users = max_users
+        self._proxies: Dict[str, Proxy] = {}
+        self._checker: Optional[Task] = None
+
+    def register(self, proxy_url: str, change_link: str | None) -> Proxy:
+        if proxy_url not in self._proxies:
+            self._proxies[proxy_url] = Proxy(proxy_url=proxy_url, change_link=change_link)
+        return self._proxies[proxy_url]
+
+    def get(self, proxy_url: str | None) -> Optional[Proxy]:
+        return self._proxies.get(proxy_url) if proxy_url else None
+
+    def start(self) -> None:
+        if MOBILE_PROXY and ROTATE_IP:
+            for proxy in self._proxies.values():
+                proxy.rotate_in_background()
+        if PROXY_CHECK_INTERVAL and (self._checker is None or self._checker.done()):
+            self._checker = create_task(self._check_loop())
+
+    async def close(self) -> None:
+        tasks = [task for task in [self._checker] if task is not None]
+        tasks += [proxy.rotation for proxy in self._proxies.values() if proxy.rotation is not None]
+        for task in tasks:
+            task.cancel()
+        await gather(*tasks, return_exceptions=True)
+        self._checker = None
+
+    async def acquire(self, proxy: Proxy | None) -> Proxy | None:
+        """The proxy a wallet should use now: its own once any IP change finished, or a healthy stand-in.
+
+        Only waits for an IP change in flight. Every acquired proxy has to be handed back with `release`.
+        """
+        if proxy is None:
+            return None
+
+        while True:
+            chosen = proxy if proxy.is_healthy else self.best() or proxy
+            if not chosen.is_rotating:
+                break
+            await chosen.wait_rotation()
+
+        if chosen is not proxy:
+            logger.warning(
+                f'Proxy {proxy.proxy_url.split("@")[-1]} is quarantined, '
+                f'using {chosen.proxy_url.split("@")[-1]} instead'
+            )
+        chosen.users += 1
+        return chosen
+
+    def release(self, proxy: Proxy | None) -> None:
+        """Called when a wallet is done with its proxy. The last wallet out gets a fresh IP ready for the next."""
+        if proxy is None:
+            return
+
+        proxy.users = max(proxy.users - 1, 0)
+        if not proxy.users and MOBILE_PROXY and ROTATE_IP:
+            proxy.rotate_in_background()
+
+    def has_room(self, proxy: Proxy) -> bool:
+        return not self.max_users or proxy.users < self.max_users
+
+    def best(self) -> Optional[Proxy]:
+        """The healthiest proxy, preferring those that can take another wallet."""
+        available = [proxy for proxy in self._proxies.values() if proxy.is_healthy]
+        if not available:
+            return None
+        return max(
+            available,
+            key=lambda proxy: (self.has_room(proxy), proxy.success_rate, -(proxy.latency or 0))
+        )
+
+    async def call(self, proxy_url: str | None, request: Callable[[], Awaitable[T]]) -> T:
+        proxy = self.get(proxy_url)
+        if proxy is None:
+            return await request()
+
+        started_at = monotonic()
+        try:
+            result = await request()
+        except PROXY_ERRORS:
+            proxy.record(monotonic() - started_at, ok=False)
+            raise
+        proxy.record(monotonic() - started_at, ok=True)
+        return result
+
+    async def _check_loop(self) -> None:
+        while True:
+            await gather(*[self._check(proxy) for proxy in self._proxies.values()])
+            await sleep(PROXY_CHECK_INTERVAL)
+
+    async def _check(self, proxy: Proxy) -> None:
+        if proxy.is_rotating:
+            return
+
+        async def probe() -> None:
+            async with sessions.get(proxy.proxy_url, 'api').get(PROXY_CHECK_URL) as response:
+                response.raise_for_status()
+
+        try:
+            with metrics.timer('proxy_check', endpoint_label(proxy.proxy_url)):
+                await self.call(proxy.proxy_url, probe)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        proxies: List[Proxy] = list(self._proxies.values())
+        return {'healthy': sum(proxy.is_healthy for proxy in proxies), 'total': len(proxies)}
+
+
+proxy_pool = ProxyPool()
@@ -0,0 +1,182 @@
+from asyncio import Future, Task, TimeoutError, create_task, get_running_loop, sleep, wait_for, shield
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from eth_typing import HexStr
+from loguru import logger
+from web3 import AsyncWeb3
+from web3.eth import AsyncEth
+from web3.types import TxReceipt
+
+from config import (
+    RECEIPT_POLL_INTERVAL,
+    RECEIPT_CONFIRMATIONS,
+    RECEIPT_LOOKBACK_BLOCKS,
+    RECEIPT_MAX_BLOCKS_PER_POLL,
+)
+from src.utils.proxy_manager import Proxy
+from src.utils.request_client.rpc_pool import RPCPoolProvider
+
+
+@dataclass
+class _Waiter:
+    future: Future
+    confirmations: int
+    keys: List[str]
+    blocks: Optional[int] = None
+    deadline_block: Optional[int] = None
+    receipt: Optional[TxReceipt] = None
+
+
+class ReceiptWatcher:
+    """Follows new blocks of one chain and resolves the receipts of every pending transaction on it.
+
+    Instead of each wallet polling `eth_getTransactionReceipt` for its own hash, the watcher fetches
+    every new block once, matches its transaction hashes against all pending waiters and fetches
+    receipts only for the hashes that were actually included.
+    """
+
+    def __init__(self, chain_name: str) -> None:
+        self.chain_name = chain_name
+        self._waiters: Dict[str, _Waiter] = {}
+        self._web3: Optional[AsyncWeb3] = None
+        self._source: Optional[tuple[str, Proxy | None]] = None
+        self._task: Optional[Task] = None
+        self._last_block: Optional[int] = None
+
+    @property
+    def pending(self) -> int:
+        return len({id(waiter) for waiter in self._waiters.values()})
+
+    async def wait(
+            self,
+            tx_hashes: HexStr | List[HexStr],
+            rpc: str | List[str],
+            proxy: Proxy | None,
+            confirmations: int = RECEIPT_CONFIRMATIONS,
+            timeout: float = 600,
+            blocks: Optional[int] = None
+    ) -> Optional[TxReceipt]:
+        """Returns the receipt of whichever hash gets enough confirmations first.
+
+        Returns None on timeout, or once `blocks` new blocks passed without any of the hashes being included.
+        """
+        self._source = (rpc, proxy)
+        keys = [tx_hash.lower() for tx_hash in ([tx_hashes] if isinstance(tx_hashes, str) else tx_hashes)]
+        waiter = _Waiter(
+            future=get_running_loop().create_future(),
+            confirmations=max(1, confirmations),
+            keys=keys,
+            blocks=blocks
+        )
+        for key in keys:
+            self._waiters[key] = waiter
+
+        self._ensure_running()
+        try:
+            return await wait_for(shield(waiter.future), timeout)
+        except TimeoutError:
+            return None
+        finally:
+            self._discard(waiter)
+
+    def _discard(self, waiter: _Waiter) -> None:
+        for key in waiter.keys:
+            if self._waiters.get(key) is waiter:
+                self._waiters.pop(key, None)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            # Nothing was pending while the watcher was idle, so it starts again from recent blocks
+            self._last_block = None
+            self._task = create_task(self._run())
+
+    def _get_web3(self) -> AsyncWeb3:
+        if self._web3 is None:
+            rpc, proxy = self._source
+            self._web3 = AsyncWeb3(
+                provider=RPCPoolProvider(endpoint_uris=rpc, proxy=proxy),
+                modules={'eth': (AsyncEth,)},
+            )
+        return self._web3
+
+    async def _run(self) -> None:
+        while self._waiters:
+            caught_up = True
+            try:
+                caught_up = await self._poll()
+            except Exception as ex:
+                logger.warning(f'{self.chain_name} | Receipt watcher error: {ex}')
+                # Rebuild the client from the most recent waiter in case the current proxy went bad
+                self._web3 = None
+            if caught_up:
+                await sleep(RECEIPT_POLL_INTERVAL)
+
+    async def _poll(self) -> bool:
+        web3 = self._get_web3()
+        head = await web3.eth.block_number
+
+        if self._last_block is None:
+            # Transactions sent just before the watcher started may already sit in recent blocks
+            self._last_block = head - RECEIPT_LOOKBACK_BLOCKS
+
+        if head > self._last_block:
+            to_block = min(head, self._last_block + RECEIPT_MAX_BLOCKS_PER_POLL)
+            await self._scan_blocks(web3, self._last_block + 1, to_block)
+            self._last_block = to_block
+
+        for waiter in {id(waiter): waiter for waiter in self._waiters.values()}.values():
+            if waiter.future.done():
+                continue
+            if waiter.receipt is None:
+                if waiter.blocks is None:
+                    continue
+                if waiter.deadline_block is None:
+                    waiter.deadline_block = head + waiter.blocks
+                elif self._last_block >= waiter.deadline_block:
+                    waiter.future.set_result(None)
+                    self._discard(waiter)
+                continue
+            if head - waiter.receipt['blockNumber'] + 1 >= waiter.confirmations:
+                waiter.future.set_result(waiter.receipt)
+                self._discard(waiter)
+
+        return self._last_block >= head
+
+    async def _scan_blocks(self, web3: AsyncWeb3, from_block: int, to_block: int) -> None:
+        async with web3.batch_requests() as batch:
+            for block_number in range(from_block, to_block + 1):
+                batch.add(web3.eth.get_block(block_number))
+            blocks = await batch.async_execute()
+
+        included = []
+        for block in blocks:
+            if not block:
+                continue
+            for tx_hash in block['transactions']:
+                key = web3.to_hex(tx_hash).lower()
+                waiter = self._waiters.get(key)
+                if waiter is not None and waiter.receipt is None:
+                    included.append(key)
+
+        if not included:
+            return
+
+        async with web3.batch_requests() as batch:
+            for key in included:
+                batch.add(web3.eth.get_transaction_receipt(key))
+            receipts: List[Any] = await batch.async_execute()
+
+        for key, receipt in zip(included, receipts):
+            if receipt and key in self._waiters:
+                self._waiters[key].receipt = receipt
+
+
+receipt_watchers: Dict[str, ReceiptWatcher] = {}
+
+
+def get_receipt_watcher(chain_name: str) -> ReceiptWatcher:
+    chain_name = chain_name.upper()
+    if chain_name not in receipt_watchers:
+        receipt_watchers[chain_name] = ReceiptWatcher(chain_name)
+    return receipt_watchers[chain_name]
@@ -0,0 +1,69 @@
+from asyncio import TimeoutError, sleep
+from time import monotonic
+from typing import Awaitable, Callable, Dict, TypeVar
+from urllib.parse import urlparse
+
+from aiohttp import ClientError
+from loguru import logger
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_OPEN_SECONDS
+from src.utils.wrappers.retry_policy import ErrorKind, classify_error, get_retry_after
+
+T = TypeVar('T')
+
+
+class CircuitBreaker:
+    """Pauses all traffic to one host after CIRCUIT_FAILURE_THRESHOLD failures in a row.
+
+    While the circuit is open, `wait` holds callers back instead of letting every wallet hit a dead host.
+    Once the pause is over requests go through again, but the failure count only resets on a success,
+    so the next failure opens the circuit straight away.
+    """
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.failures = 0
+        self.open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return monotonic() < self.open_until
+
+    async def wait(self) -> None:
+        while self.is_open:
+            await sleep(self.open_until - monotonic())
+
+    async def call(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Sends `request` once the circuit is closed and counts its outcome. Only transport errors count."""
+        await self.wait()
+        try:
+            result = await request()
+        except (ClientError, TimeoutError) as ex:
+            self.record_failure(get_retry_after(ex) if classify_error(ex) == ErrorKind.RATE_LIMIT else None)
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self, pause: float | None = None) -> None:
+        """Counts a failure. `pause` (e.g. a Retry-After) opens the circuit for that long right away."""
+        self.failures += 1
+        if pause is None and self.failures < CIRCUIT_FAILURE_THRESHOLD:
+            return
+
+        open_for = max(pause or 0, CIRCUIT_OPEN_SECONDS if self.failures >= CIRCUIT_FAILURE_THRESHOLD else 0)
+        if not self.is_open:
+            logger.warning(f'{self.host} | {self.failures} failed requests, pausing it for {open_for:.0f}s')
+        self.open_until = max(self.open_until, monotonic() + open_for)
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    host = urlparse(url).netloc or url
+    if host not in circuit_breakers:
+        circuit_breakers[host] = CircuitBreaker(host)
+    return circuit_breakers[host]
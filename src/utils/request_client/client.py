@@ -1,19 +1,22 @@
 from typing import Dict, Any
 from loguru import logger
 
-from aiohttp import ClientSession, TCPConnector
-from aiohttp_socks import ProxyConnector
+from aiohttp import ClientSession
 
-from src.utils.proxy_manager import Proxy
+from src.utils.metrics import endpoint_label, metrics
+from src.utils.proxy_manager import Proxy, proxy_pool
+from src.utils.request_client.circuit_breaker import get_circuit_breaker
+from src.utils.request_client.rate_limiter import rate_limiters
+from src.utils.request_client.session_pool import sessions
 
 
 class RequestClient:
     def __init__(self, proxy: Proxy | None):
-        self.session = ClientSession(
-            connector=ProxyConnector.from_url(proxy.proxy_url, ) if proxy else TCPConnector(
-                verify_ssl=False
-            )
-        )
+        self.proxy = proxy
+
+    @property
+    def session(self) -> ClientSession:
+        return sessions.get(self.proxy.proxy_url if self.proxy else None, 'api')
 
     async def make_request(
             self,
@@ -24,13 +27,39 @@ class RequestClient:
             json: Dict[str, Any] | list = None,
             params: Dict[str, Any] = None
     ):
-        async with self.session.request(
-                method=method, url=url, headers=headers, data=data, params=params, json=json
-        ) as response:
-            try:
-                response_json = await response.json()
-                if response.status == 200:
-                    return response_json
-
-            except Exception as ex:
-                logger.error(f'Something went wrong {ex}')
+        proxy_url = self.proxy.proxy_url if self.proxy else None
+
+        async def send():
+            # Taken before the proxy starts timing, so waiting for a token is not counted as proxy latency
+            await rate_limiters.acquire(url, proxy_url)
+            return await proxy_pool.call(
+                proxy_url,
+                lambda: self._send_request(method, url, headers, data, json, params)
+            )
+
+        return await get_circuit_breaker(url).call(send)
+
+    async def _send_request(
+            self,
+            method: str,
+            url: str,
+            headers: Dict[str, Any] | None,
+            data: str | None,
+            json: Dict[str, Any] | list | None,
+            params: Dict[str, Any] | None
+    ):
+        with metrics.timer('api', endpoint_label(url)):
+            async with self.session.request(
+                    method=method, url=url, headers=headers, data=data, params=params, json=json
+            ) as response:
+                if response.status == 429 or response.status >= 500:
+                    # Raised so the retry policy can wait out Retry-After and the circuit breaker can count it
+                    response.raise_for_status()
+
+                try:
+                    response_json = await response.json()
+                    if response.status == 200:
+                        return response_json
+
+                except Exception as ex:
+                    logger.error(f'Something went wrong {ex}')
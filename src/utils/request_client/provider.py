@@ -0,0 +1,56 @@
+from typing import Any, Dict, Optional, Union
+
+from aiohttp import ClientSession, ClientTimeout
+from eth_typing import URI
+from web3 import AsyncWeb3
+from web3._utils.http_session_manager import HTTPSessionManager
+from web3._utils.rpc_abi import RPC
+
+from src.utils.metrics import endpoint_label, metrics
+from src.utils.proxy_manager import Proxy, proxy_pool
+from src.utils.request_client.circuit_breaker import get_circuit_breaker
+from src.utils.request_client.rate_limiter import rate_limiters
+from src.utils.request_client.session_pool import sessions
+
+
+class SharedSessionManager(HTTPSessionManager):
+    def __init__(self, proxy_url: str | None) -> None:
+        super().__init__()
+        self.proxy_url = proxy_url
+
+    async def async_cache_and_return_session(
+            self,
+            endpoint_uri: URI,
+            session: Optional[ClientSession] = None,
+            request_timeout: Optional[ClientTimeout] = None,
+    ) -> ClientSession:
+        return sessions.get(self.proxy_url, 'rpc')
+
+    async def async_make_post_request(
+            self,
+            endpoint_uri: URI,
+            data: Union[bytes, Dict[str, Any]],
+            **kwargs: Any
+    ) -> bytes:
+        async def send() -> bytes:
+            await rate_limiters.acquire(endpoint_uri, self.proxy_url)
+            with metrics.timer('rpc', endpoint_label(endpoint_uri)):
+                return await proxy_pool.call(
+                    self.proxy_url,
+                    lambda: super(SharedSessionManager, self).async_make_post_request(endpoint_uri, data, **kwargs)
+                )
+
+        return await get_circuit_breaker(endpoint_uri).call(send)
+
+
+class PooledHTTPProvider(AsyncWeb3.AsyncHTTPProvider):
+    """JSON-RPC provider that sends its requests through the shared session of its proxy."""
+
+    def __init__(self, endpoint_uri: str | None, proxy: Proxy | None, **kwargs: Any) -> None:
+        # web3's validation middleware asks for the chain id before every call and gas estimate
+        kwargs.setdefault('cache_allowed_requests', True)
+        kwargs.setdefault('cacheable_requests', {RPC.eth_chainId})
+        # Failed requests are retried by the task's retry policy, with the circuit breaker in front of the host
+        kwargs.setdefault('exception_retry_configuration', None)
+        super().__init__(endpoint_uri=endpoint_uri, **kwargs)
+        self._request_session_manager = SharedSessionManager(proxy.proxy_url if proxy else None)
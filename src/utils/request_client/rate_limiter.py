@@ -0,0 +1,58 @@
+from asyncio import Lock, sleep
+from time import monotonic
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import RATE_LIMITS, RATE_LIMIT_DEFAULT, RATE_LIMIT_PER_PROXY
+from src.utils.metrics import endpoint_label, metrics
+
+
+class TokenBucket:
+    """Lets `rate` requests per second through on average, with up to `burst` at once after a quiet period.
+
+    Waiters are served one at a time in arrival order, so a wallet that queued first is sent first.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = monotonic()
+        self._lock = Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class RateLimiterRegistry:
+    """One token bucket per host (and per proxy with RATE_LIMIT_PER_PROXY), shared by every wallet."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[Tuple[str, str | None], Optional[TokenBucket]] = {}
+
+    def get(self, url: str, proxy_url: str | None = None) -> Optional[TokenBucket]:
+        host = urlparse(url).netloc or url
+        key = (host, proxy_url if RATE_LIMIT_PER_PROXY else None)
+        if key not in self._buckets:
+            limit = RATE_LIMITS.get(host, RATE_LIMIT_DEFAULT)
+            self._buckets[key] = TokenBucket(rate=limit[0], burst=limit[1]) if limit else None
+        return self._buckets[key]
+
+    async def acquire(self, url: str, proxy_url: str | None = None) -> None:
+        bucket = self.get(url, proxy_url)
+        if bucket is not None:
+            with metrics.timer('rate_limit_wait', endpoint_label(url)):
+                await bucket.acquire()
+
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,197 @@
+from asyncio import FIRST_COMPLETED, Task, as_completed, create_task, wait
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from web3.types import RPCEndpoint, RPCResponse
+
+from config import RPC_EWMA_ALPHA, RPC_ERROR_PENALTY, RPC_HEDGE_READS, RPC_HEDGE_MIN_DELAY
+from src.utils.proxy_manager import Proxy
+from src.utils.request_client.circuit_breaker import get_circuit_breaker
+from src.utils.request_client.provider import PooledHTTPProvider
+from src.utils.wrappers.retry_policy import RATE_LIMIT_ERRORS
+
+BROADCAST_METHODS = {'eth_sendRawTransaction'}
+# JSON-RPC errors that say the endpoint could not serve the request, rather than answering it
+ENDPOINT_ERROR_CODES = {-32005, -32603, 429}
+ENDPOINT_ERRORS = RATE_LIMIT_ERRORS + (
+    'header not found',
+    'unknown block',
+    'timeout',
+    'timed out',
+    'temporarily unavailable',
+    'service unavailable',
+    'bad gateway',
+    'upstream',
+    'capacity',
+)
+
+
+class EndpointStats:
+    """Exponentially weighted latency, latency spread and error rate of one RPC endpoint."""
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None
+        self.deviation = 0.0
+        self.error_rate = 0.0
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.error_rate += RPC_EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            return
+        if self.latency is None:
+            self.latency = elapsed
+            return
+        self.deviation += RPC_EWMA_ALPHA * (abs(elapsed - self.latency) - self.deviation)
+        self.latency += RPC_EWMA_ALPHA * (elapsed - self.latency)
+
+    @property
+    def score(self) -> float:
+        # Endpoints nobody has measured yet score 0, so each one gets tried early on
+        return (self.latency or 0.0) + self.error_rate * RPC_ERROR_PENALTY
+
+    @property
+    def p95(self) -> Optional[float]:
+        """Rough 95th percentile latency, assuming a normal spread around the average."""
+        if self.latency is None:
+            return None
+        return max(self.latency + 2 * self.deviation, RPC_HEDGE_MIN_DELAY)
+
+
+endpoint_stats: Dict[str, EndpointStats] = {}
+
+
+def get_endpoint_stats(endpoint_uri: str) -> EndpointStats:
+    if endpoint_uri not in endpoint_stats:
+        endpoint_stats[endpoint_uri] = EndpointStats()
+    return endpoint_stats[endpoint_uri]
+
+
+def is_endpoint_error(response: RPCResponse) -> bool:
+    """Whether a response carries an error another endpoint might not have, like a rate limit or a lagging node."""
+    error = response.get('error')
+    if not error:
+        return False
+    if not isinstance(error, dict):
+        error = {'message': str(error)}
+    message = str(error.get('message', '')).lower()
+    if 'revert' in message:
+        # Some nodes report reverts as internal errors, but every endpoint would answer the same
+        return False
+    return error.get('code') in ENDPOINT_ERROR_CODES or any(text in message for text in ENDPOINT_ERRORS)
+
+
+def rank_endpoints(endpoint_uris: Sequence[str]) -> List[str]:
+    """Endpoints from best to worst score, with hosts paused by their circuit breaker moved to the end."""
+    return sorted(
+        endpoint_uris,
+        key=lambda uri: (get_circuit_breaker(uri).is_open, get_endpoint_stats(uri).score)
+    )
+
+
+class RPCPoolProvider(PooledHTTPProvider):
+    """Spreads one wallet's JSON-RPC traffic over every endpoint of its chain.
+
+    Reads go to the endpoint with the best score. If it has not answered by its p95 latency, the same
+    read is sent to the next endpoint as well and whichever answers first wins (RPC_HEDGE_READS).
+    A failed read moves on to the next endpoint, including one answered with a rate limit or another
+    endpoint error in the JSON-RPC body. Raw transactions are broadcast to all endpoints.
+    Scores are shared by all wallets, since they all see the same endpoints.
+    """
+
+    def __init__(self, endpoint_uris: str | Sequence[str] | None, proxy: Proxy | None, **kwargs: Any) -> None:
+        uris = list(endpoint_uris) if isinstance(endpoint_uris, (list, tuple)) else [endpoint_uris]
+        super().__init__(endpoint_uri=uris[0], proxy=proxy, **kwargs)
+        self.endpoint_uris = uris
+        self._providers = {uri: PooledHTTPProvider(endpoint_uri=uri, proxy=proxy, **kwargs) for uri in uris}
+        self._background: Set[Task] = set()
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if len(self.endpoint_uris) == 1:
+            return await self._request(self.endpoint_uris[0], method, params)
+        if method in BROADCAST_METHODS:
+            return await self._broadcast(method, params)
+        return await self._read(method, params)
+
+    async def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]) -> List[RPCResponse]:
+        endpoint_uri = rank_endpoints(self.endpoint_uris)[0]
+        started_at = perf_counter()
+        try:
+            responses = await self._providers[endpoint_uri].make_batch_request(batch_requests)
+        except Exception:
+            get_endpoint_stats(endpoint_uri).record(perf_counter() - started_at, ok=False)
+            raise
+        ok = not any(isinstance(response, dict) and is_endpoint_error(response) for response in responses)
+        get_endpoint_stats(endpoint_uri).record(perf_counter() - started_at, ok=ok)
+        return responses
+
+    async def _request(self, endpoint_uri: str, method: RPCEndpoint, params: Any) -> RPCResponse:
+        started_at = perf_counter()
+        try:
+            response = await self._providers[endpoint_uri].make_request(method, params)
+        except Exception:
+            get_endpoint_stats(endpoint_uri).record(perf_counter() - started_at, ok=False)
+            raise
+        get_endpoint_stats(endpoint_uri).record(perf_counter() - started_at, ok=not is_endpoint_error(response))
+        return response
+
+    async def _read(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        endpoint_uris = rank_endpoints(self.endpoint_uris)
+        hedge_after = get_endpoint_stats(endpoint_uris[0]).p95 if RPC_HEDGE_READS else None
+        pending = {create_task(self._request(endpoint_uris.pop(0), method, params))}
+        first_error: Optional[BaseException] = None
+        first_error_response: Optional[RPCResponse] = None
+        try:
+            while pending:
+                done, pending = await wait(pending, timeout=hedge_after, return_when=FIRST_COMPLETED)
+                # Only the first endpoint gets a hedged twin, after that endpoints only stand in for failures
+                hedge_after = None
+
+                failed = False
+                for task in done:
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                    elif is_endpoint_error(task.result()):
+                        first_error_response = first_error_response or task.result()
+                    else:
+                        return task.result()
+                    failed = True
+
+                if endpoint_uris and (failed or not done):
+                    pending.add(create_task(self._request(endpoint_uris.pop(0), method, params)))
+            # Every endpoint failed. An error response is returned as is, so web3 raises it as usual
+            if first_error_response is not None:
+                return first_error_response
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _broadcast(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        tasks = [create_task(self._request(uri, method, params)) for uri in rank_endpoints(self.endpoint_uris)]
+        first_response: Optional[RPCResponse] = None
+        first_error: Optional[BaseException] = None
+        for next_done in as_completed(tasks):
+            try:
+                response = await next_done
+            except Exception as ex:
+                first_error = first_error or ex
+                continue
+
+            if 'error' not in response:
+                # The other endpoints keep relaying the transaction in the background
+                for task in tasks:
+                    if not task.done():
+                        self._background.add(task)
+                        task.add_done_callback(self._discard_background)
+                return response
+            first_response = first_response or response
+
+        if first_response is not None:
+            return first_response
+        raise first_error
+
+    def _discard_background(self, task: Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled():
+            # "already known" and the like from the slower endpoints are expected here
+            task.exception()
@@ -0,0 +1,63 @@
+from typing import Dict, Tuple
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from aiohttp_socks import ProxyConnector
+from loguru import logger
+
+from config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_TIMEOUT,
+    DNS_CACHE_TTL,
+)
+
+
+class SessionRegistry:
+    """Process-wide aiohttp sessions keyed by (proxy URL, host class).
+
+    Every wallet behind the same proxy shares one keep-alive connection pool per host class
+    ('api' for the Superform/dynamicauth endpoints, 'rpc' for JSON-RPC), instead of opening
+    and leaking a pool of its own.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: Dict[Tuple[str | None, str], ClientSession] = {}
+
+    def get(self, proxy_url: str | None, host_class: str) -> ClientSession:
+        key = (proxy_url, host_class)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = ClientSession(
+                connector=self._create_connector(proxy_url, host_class),
+                timeout=ClientTimeout(total=HTTP_TIMEOUT)
+            )
+            self._sessions[key] = session
+        return session
+
+    @staticmethod
+    def _create_connector(proxy_url: str | None, host_class: str) -> TCPConnector:
+        connector_args = {
+            'limit': HTTP_POOL_LIMIT,
+            'limit_per_host': HTTP_POOL_LIMIT_PER_HOST,
+            'keepalive_timeout': HTTP_KEEPALIVE_TIMEOUT,
+            'ttl_dns_cache': DNS_CACHE_TTL,
+        }
+        if proxy_url:
+            return ProxyConnector.from_url(proxy_url, **connector_args)
+        if host_class == 'api':
+            # The direct API client never verified certificates, traffic through proxies and to RPCs always does
+            connector_args['ssl'] = False
+        return TCPConnector(**connector_args)
+
+    async def close(self) -> None:
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        if sessions:
+            logger.debug(f'Closed {len(sessions)} HTTP sessions')
+
+
+sessions = SessionRegistry()
@@ -13,26 +13,26 @@ async def get_routes(private_keys: str) -> Optional[List[Route]]:
             action='working_wallets'
         )
     )
-    result = await db_utils.get_uncompleted_wallets()
+    result = await db_utils.get_pending_routes()
     if not result:
         logger.success(f'Все кошельки с данной базы данных уже отработали')
         return
 
+    keys_by_lower = {private_key.lower(): private_key for private_key in private_keys}
+
     routes = []
-    for wallet in result:
-        for private_key in private_keys:
-            if wallet.private_key.lower() == private_key.lower():
-                private_key_tasks = await db_utils.get_wallet_pending_tasks(private_key)
-                tasks = []
-                for task in private_key_tasks:
-                    tasks.append(task.task_name)
-                routes.append(
-                    Route(
-                        tasks=tasks,
-                        wallet=Wallet(
-                            private_key=private_key,
-                            proxy=wallet.proxy,
-                        )
-                    )
+    for wallet_key, proxy, task_names in result:
+        private_key = keys_by_lower.get(wallet_key.lower())
+        if private_key is None:
+            continue
+
+        routes.append(
+            Route(
+                tasks=task_names.split(',') if task_names else [],
+                wallet=Wallet(
+                    private_key=private_key,
+                    proxy=proxy,
                 )
+            )
+        )
     return routes
@@ -1,5 +1,7 @@
 import random
-from typing import Optional
+from asyncio import Task, create_task
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
 
 from loguru import logger
 
@@ -7,17 +9,19 @@ from src.models.chain import Chain
 from src.models.superform import DepositConfig, WithdrawConfig
 from src.models.token import Token
 from src.superform.superform import SuperForm
-from src.utils.proxy_manager import Proxy
+from src.utils.pipeline import Pipeline
+from src.utils.manage_tasks import REFERRAL_TASK, manage_tasks
+from src.utils.proxy_manager import Proxy, proxy_pool
 from src.utils.data.chains import chain_mapping
 from config import *
 
 
-async def process_superform_deposit(private_key: str, proxy: Proxy | None) -> Optional[bool]:
+def create_deposit_superform(private_key: str, proxy: Proxy | None) -> SuperForm:
     deposit_settings = DepositConfig(
         chain=Chain(
             chain_name=DepositSettings.chain,
             native_token=chain_mapping[DepositSettings.chain.upper()].native_token,
-            rpc=chain_mapping[DepositSettings.chain.upper()].rpc,
+            rpc=chain_mapping[DepositSettings.chain.upper()].rpcs,
             chain_id=chain_mapping[DepositSettings.chain.upper()].chain_id
         ),
         token=Token(
@@ -30,20 +34,16 @@ async def process_superform_deposit(private_key: str, proxy: Proxy | None) -> Op
         deposit_percentage=DepositSettings.deposit_percentage,
     )
 
-    superform = SuperForm(
+    return SuperForm(
         private_key=private_key,
         proxy=proxy,
         deposit_config=deposit_settings,
         withdraw_config=None
     )
-    logger.debug(superform)
-    deposited = await superform.deposit()
-    if deposited:
-        return True
 
 
-async def process_superform_withdraw(private_key: str, proxy: Proxy | None) -> Optional[bool]:
-    superform = SuperForm(
+def create_withdraw_superform(private_key: str, proxy: Proxy | None) -> SuperForm:
+    return SuperForm(
         private_key=private_key,
         proxy=proxy,
         deposit_config=None,
@@ -51,7 +51,7 @@ async def process_superform_withdraw(private_key: str, proxy: Proxy | None) -> O
             chain=Chain(
                 chain_name=WithdrawSettings.chain,
                 native_token=chain_mapping[DepositSettings.chain.upper()].native_token,
-                rpc=chain_mapping[DepositSettings.chain.upper()].rpc,
+                rpc=chain_mapping[DepositSettings.chain.upper()].rpcs,
                 chain_id=chain_mapping[DepositSettings.chain.upper()].chain_id
             ),
             target_token=Token(
@@ -60,17 +60,110 @@ async def process_superform_withdraw(private_key: str, proxy: Proxy | None) -> O
             )
         )
     )
+
+
+async def process_superform_deposit(
+        private_key: str,
+        proxy: Proxy | None,
+        pipeline: Pipeline | None = None
+) -> Optional[bool]:
+    superform = create_deposit_superform(private_key, proxy)
+    logger.debug(superform)
+    if pipeline:
+        deposited = await pipeline.run(superform, superform.prepare_deposit, superform.confirm_deposit)
+    else:
+        deposited = await superform.deposit()
+    if deposited:
+        return True
+
+
+async def process_superform_withdraw(
+        private_key: str,
+        proxy: Proxy | None,
+        pipeline: Pipeline | None = None
+) -> Optional[bool]:
+    superform = create_withdraw_superform(private_key, proxy)
     logger.debug(superform)
-    withdrawn = await superform.withdraw()
+    if pipeline:
+        withdrawn = await pipeline.run(superform, superform.prepare_withdraw, superform.confirm_withdraw)
+    else:
+        withdrawn = await superform.withdraw()
     if withdrawn:
         return True
 
 
-async def process_register_referral(private_key: str, proxy: Proxy | None):
-    superform = SuperForm(
-        private_key=private_key,
-        proxy=proxy,
-    )
+async def submit_superform_task(
+        task: str,
+        private_key: str,
+        proxy: Proxy | None,
+        pipeline: Pipeline,
+        on_done: Callable[[Optional[bool]], Awaitable[None]]
+) -> None:
+    """Hands a DEPOSIT or WITHDRAW task to the pipeline and returns once its transaction is sent."""
+    if task == 'DEPOSIT':
+        superform = create_deposit_superform(private_key, proxy)
+        prepare, confirm = superform.prepare_deposit, superform.confirm_deposit
+    else:
+        superform = create_withdraw_superform(private_key, proxy)
+        prepare, confirm = superform.prepare_withdraw, superform.confirm_withdraw
+    logger.debug(superform)
+    await pipeline.submit(superform, prepare, confirm, on_done)
+
+
+async def process_register_referral(
+        private_key: str,
+        proxy: Proxy | None,
+        superform: SuperForm | None = None
+) -> Optional[bool]:
+    if superform is None:
+        superform = SuperForm(
+            private_key=private_key,
+            proxy=proxy,
+        )
     logger.debug(superform)
     referral_code = random.choice(REFERRAL_CODES)
-    await superform.register_referral(referral_code)
+    registered = await superform.register_referral(referral_code)
+    if registered:
+        return True
+
+
+@dataclass
+class ReferralJob:
+    index: int
+    private_key: str
+    proxy: Proxy | None
+
+
+class ReferralRunner:
+    """Registers referrals for a list of wallets, handed out by a WorkerPool.
+
+    As soon as the pool admits a wallet, it takes its proxy and starts fetching the dynamicauth nonce,
+    so the first request is answered while the wallet waits for its start slot.
+    Registered wallets are saved as completed REFERRAL tasks, so a restart skips them.
+    """
+
+    def __init__(self) -> None:
+        self._admitted: Dict[int, Task] = {}
+
+    def admit(self, job: ReferralJob) -> None:
+        self._admitted[job.index] = create_task(self._prepare(job))
+
+    async def _prepare(self, job: ReferralJob) -> tuple[Proxy | None, SuperForm]:
+        # Waits for an IP change in flight or swaps a quarantined proxy first, so the nonce goes through
+        # the proxy the wallet will actually use
+        proxy = await proxy_pool.acquire(job.proxy)
+        superform = SuperForm(private_key=job.private_key, proxy=proxy)
+        superform.prefetch_nonce()
+        return proxy, superform
+
+    async def process(self, job: ReferralJob) -> bool:
+        admitted = self._admitted.pop(job.index, None) or create_task(self._prepare(job))
+        proxy, superform = await admitted
+        try:
+            registered = bool(await process_register_referral(job.private_key, proxy, superform))
+            if registered:
+                await manage_tasks(job.private_key, REFERRAL_TASK)
+            return registered
+        finally:
+            superform.drop_prefetched_nonce()
+            proxy_pool.release(proxy)
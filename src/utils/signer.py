@@ -0,0 +1,123 @@
+import os
+from asyncio import create_task, gather, get_running_loop, run, sleep
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+from eth_account import Account as EthAccount
+from eth_account.messages import encode_defunct
+from loguru import logger
+
+from config import SIGNER_PROCESSES, SIGNER_CHUNK_SIZE
+from src.utils.metrics import metrics
+
+
+def derive_address(private_key: str) -> str:
+    return EthAccount.from_key(private_key).address
+
+
+def derive_addresses(private_keys: List[str]) -> List[str]:
+    return [derive_address(private_key) for private_key in private_keys]
+
+
+def sign_transaction(tx: Dict[str, Any], private_key: str) -> bytes:
+    return bytes(EthAccount.sign_transaction(tx, private_key).raw_transaction)
+
+
+def sign_message(text: str, private_key: str) -> str:
+    signature = EthAccount.sign_message(encode_defunct(text=text), private_key=private_key).signature
+    return '0x' + bytes(signature).hex()
+
+
+class Signer:
+    """Derives addresses and signs transactions and messages, either inline or in a process pool.
+
+    ECDSA in eth_account is pure Python and takes a few milliseconds per call. With `processes` > 0
+    that work runs in worker processes so it does not stall the event loop for every other wallet.
+    """
+
+    def __init__(self, processes: int = SIGNER_PROCESSES) -> None:
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._addresses: Dict[str, str] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        if self.processes <= 0:
+            return func(*args)
+        return await get_running_loop().run_in_executor(self._get_executor(), func, *args)
+
+    def address(self, private_key: str) -> str:
+        """Address of `private_key`, taken from the addresses derived ahead by `derive_addresses` when possible."""
+        if private_key not in self._addresses:
+            self._addresses[private_key] = derive_address(private_key)
+        return self._addresses[private_key]
+
+    async def derive_addresses(self, private_keys: List[str]) -> None:
+        """Derives the addresses of all wallets up front, SIGNER_CHUNK_SIZE keys per pool task."""
+        missing = list(dict.fromkeys(key for key in private_keys if key not in self._addresses))
+        chunks = [missing[i:i + SIGNER_CHUNK_SIZE] for i in range(0, len(missing), SIGNER_CHUNK_SIZE)]
+        results = await gather(*[self._run(derive_addresses, chunk) for chunk in chunks])
+        for chunk, addresses in zip(chunks, results):
+            self._addresses.update(zip(chunk, addresses))
+
+    async def sign_transaction(self, tx: Dict[str, Any], private_key: str) -> bytes:
+        with metrics.timer('sign', 'transaction'):
+            return await self._run(sign_transaction, dict(tx), private_key)
+
+    async def sign_message(self, text: str, private_key: str) -> str:
+        with metrics.timer('sign', 'message'):
+            return await self._run(sign_message, text, private_key)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+signer = Signer()
+
+
+async def benchmark(count: int = 500, processes: int = os.cpu_count() or 1) -> None:
+    """Signs `count` transactions inline and in a pool, reporting throughput and the worst event loop stall."""
+    private_key = '0x' + '11' * 32
+    tx = {
+        'to': '0x' + '22' * 20, 'value': 1, 'gas': 21000, 'nonce': 0, 'chainId': 8453,
+        'maxFeePerGas': 2_000_000, 'maxPriorityFeePerGas': 1_000_000, 'data': b'\x00' * 256,
+    }
+
+    for name, bench_signer in (('inline', Signer(0)), (f'{processes} processes', Signer(processes))):
+        # Start the workers before timing so the pool start-up is not counted
+        warm_up = max(1, bench_signer.processes)
+        await gather(*[bench_signer.sign_transaction(tx, private_key) for _ in range(warm_up)])
+
+        stall = 0.0
+        running = True
+
+        async def watch_loop() -> None:
+            nonlocal stall
+            while running:
+                tick = perf_counter()
+                await sleep(0.001)
+                stall = max(stall, perf_counter() - tick - 0.001)
+
+        watcher = create_task(watch_loop())
+        started = perf_counter()
+        await gather(*[bench_signer.sign_transaction({**tx, 'nonce': nonce}, private_key) for nonce in range(count)])
+        elapsed = perf_counter() - started
+        running = False
+        await watcher
+        bench_signer.close()
+
+        logger.info(
+            f'Signer benchmark | {name} | {count} txs in {elapsed:.2f}s | '
+            f'{count / elapsed:.0f} tx/s | Max loop stall: {stall * 1000:.1f}ms'
+        )
+
+
+if __name__ == '__main__':
+    run(benchmark())
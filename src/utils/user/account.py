@@ -1,75 +1,176 @@
 from time import time
-from asyncio import sleep
+from typing import Dict, List, Optional
 
 from web3.exceptions import TransactionNotFound
-from web3.types import TxParams
+from web3.types import TxParams, TxReceipt
 from web3.eth import AsyncEth
 from eth_typing import HexStr
 from web3 import AsyncWeb3
 from loguru import logger
 
-from src.models.contracts import ERC20
+from config import REPLACE_AFTER_BLOCKS, REPLACE_FEE_BUMP, REPLACE_MAX_FEE_MULTIPLIER
+
+from src.utils.chain_state import get_chain_state
+from src.utils.metrics import metrics
+from src.utils.multicall import get_multicall
+from src.utils.receipt_watcher import get_receipt_watcher
+from src.utils.signer import signer
+from src.utils.user.nonce_manager import get_nonce_manager, is_nonce_error
 from src.utils.user.utils import Utils
 from src.utils.proxy_manager import Proxy
+from src.utils.request_client.rpc_pool import RPCPoolProvider
 
 
 class Account(Utils):
     def __init__(
             self,
             private_key: str,
-            rpc: str = 'https://base.meowrpc.com',
+            rpc: str | List[str] = 'https://base.meowrpc.com',
             *,
-            proxy: Proxy | None
+            proxy: Proxy | None,
+            chain_name: str = 'BASE'
     ) -> None:
         self.private_key = private_key
-
-        request_args = {} if proxy is None else {
-            'proxy': proxy.proxy_url
-        }
+        self.proxy = proxy
+        self.chain_name = chain_name.upper()
+        self.chain_state = get_chain_state(chain_name)
+        self.multicall = get_multicall(chain_name)
 
         self.web3 = AsyncWeb3(
-            provider=AsyncWeb3.AsyncHTTPProvider(
-                endpoint_uri=rpc,
-                request_kwargs=request_args
+            provider=RPCPoolProvider(
+                endpoint_uris=rpc,
+                proxy=proxy
             ),
             modules={'eth': (AsyncEth,)},
         )
-        self.account = self.web3.eth.account.from_key(private_key)
-        self.wallet_address = self.account.address
+        self.wallet_address = signer.address(private_key)
+        self.nonce_manager = get_nonce_manager(chain_name, self.wallet_address)
+        self.sent_transactions: Dict[str, dict] = {}
+        self.original_fees: Dict[int, Dict[str, int]] = {}
 
     async def get_wallet_balance(self, is_native: bool, address: str = None) -> int:
         if not is_native:
-            contract = self.web3.eth.contract(
-                address=self.web3.to_checksum_address(address), abi=ERC20.abi
-            )
-            balance = await contract.functions.balanceOf(self.wallet_address).call()
+            balance = await self.multicall.balance_of(self.web3, address, self.wallet_address)
         else:
-            balance = await self.web3.eth.get_balance(self.wallet_address)
+            balance = await self.multicall.native_balance(self.web3, self.wallet_address)
 
         return balance
 
     async def sign_transaction(self, tx: TxParams | dict) -> HexStr:
-        signed_tx = self.web3.eth.account.sign_transaction(tx, self.private_key)
-        raw_tx_hash = await self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        if 'nonce' not in tx:
+            tx['nonce'] = await self.nonce_manager.allocate(self.web3)
+
+        try:
+            tx_hash = await self.send_transaction(tx)
+        except Exception as ex:
+            if is_nonce_error(ex):
+                self.nonce_manager.resync()
+            else:
+                self.nonce_manager.release(tx['nonce'])
+            raise
+
+        # Kept so a stuck transaction can be re-signed with the same nonce and higher fees
+        self.sent_transactions[tx_hash] = dict(tx)
+        return tx_hash
+
+    async def send_transaction(self, tx: TxParams | dict) -> HexStr:
+        raw_transaction = await signer.sign_transaction(tx, self.private_key)
+        raw_tx_hash = await self.web3.eth.send_raw_transaction(raw_transaction)
         tx_hash = self.web3.to_hex(raw_tx_hash)
         return tx_hash
 
+    async def bump_fees(self, tx: dict) -> Optional[dict]:
+        """Returns a copy of `tx` with fees raised by REPLACE_FEE_BUMP, or None once the fee cap is reached."""
+        original = self.original_fees.setdefault(tx['nonce'], {
+            field: tx[field] for field in ('maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice') if field in tx
+        })
+        current_fees = await self.chain_state.get_fee_params(self.web3)
+
+        replacement = dict(tx)
+        for field, original_value in original.items():
+            bumped = max(int(tx[field] * (1 + REPLACE_FEE_BUMP)) + 1, current_fees.get(field, 0))
+            cap = int(original_value * REPLACE_MAX_FEE_MULTIPLIER)
+            if tx[field] >= cap:
+                return None
+            replacement[field] = min(bumped, cap)
+
+        if replacement.get('maxPriorityFeePerGas', 0) > replacement.get('maxFeePerGas', float('inf')):
+            replacement['maxPriorityFeePerGas'] = replacement['maxFeePerGas']
+        return replacement
+
+    async def find_receipt(self, tx_hashes: List[HexStr]) -> Optional[TxReceipt]:
+        for tx_hash in tx_hashes:
+            try:
+                return await self.web3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
     async def wait_until_tx_finished(self, tx_hash: HexStr, max_wait_time=600) -> bool:
-        start_time = time()
+        with metrics.timer('confirm', self.chain_name):
+            confirmed = await self._wait_until_tx_finished(tx_hash, max_wait_time)
+        metrics.inc('transactions', chain=self.chain_name, outcome='confirmed' if confirmed else 'failed')
+        return confirmed
+
+    async def _wait_until_tx_finished(self, tx_hash: HexStr, max_wait_time: int) -> bool:
+        watcher = get_receipt_watcher(self.chain_name)
+        tx = self.sent_transactions.pop(tx_hash, None)
+        nonce = tx['nonce'] if tx else None
+        hashes = [tx_hash]
+        deadline = time() + max_wait_time
+
         while True:
+            # Waits are cut every REPLACE_AFTER_BLOCKS blocks, also once replacing stopped, to look up the receipts
+            receipt = await watcher.wait(
+                hashes,
+                rpc=self.web3.provider.endpoint_uris,
+                proxy=self.proxy,
+                timeout=max(deadline - time(), 0),
+                blocks=REPLACE_AFTER_BLOCKS
+            )
+            if receipt is None:
+                # One of the hashes may have been mined in a block the watcher scanned between two waits
+                try:
+                    receipt = await self.find_receipt(hashes)
+                except Exception as ex:
+                    logger.warning(f'[{self.wallet_address}] | Failed to look up receipts of {hashes[-1]}: {ex}')
+            if receipt is not None or time() >= deadline:
+                break
+            if tx is None:
+                continue
+
             try:
-                receipts = await self.web3.eth.get_transaction_receipt(tx_hash)
-                status = receipts.get("status")
-                if status == 1:
-                    logger.success(f"Transaction confirmed!")
-                    return True
-                elif status is None:
-                    await sleep(0.3)
-                else:
-                    logger.error(f"Transaction failed!")
-                    return False
-            except TransactionNotFound:
-                if time() - start_time > max_wait_time:
-                    print(f'FAILED TX: {tx_hash}')
-                    return False
-                await sleep(1)
+                replacement = await self.bump_fees(tx)
+            except Exception as ex:
+                logger.warning(f'[{self.wallet_address}] | Failed to price a replacement for {hashes[-1]}: {ex}')
+                continue
+            if replacement is None:
+                logger.warning(f'[{self.wallet_address}] | Fee cap reached, waiting for {hashes[-1]}')
+                tx = None
+                continue
+
+            try:
+                replacement_hash = await self.send_transaction(replacement)
+            except Exception as ex:
+                # "nonce too low" here means one of the previous transactions was just mined
+                logger.warning(f'[{self.wallet_address}] | Failed to replace {hashes[-1]}: {ex}')
+                continue
+
+            logger.info(f'[{self.wallet_address}] | Replaced stuck {hashes[-1]} with {replacement_hash}')
+            hashes.append(replacement_hash)
+            tx = replacement
+
+        self.original_fees.pop(nonce, None)
+
+        if receipt is None:
+            print(f'FAILED TX: {", ".join(hashes)}')
+            # The transaction may have been dropped, so its nonce can no longer be trusted
+            self.nonce_manager.resync()
+            return False
+
+        if receipt.get('status') == 1:
+            logger.success(f"Transaction confirmed!")
+            return True
+
+        logger.error(f"Transaction failed!")
+        return False
@@ -0,0 +1,59 @@
+from asyncio import Lock
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from web3 import AsyncWeb3
+
+NONCE_ERRORS = (
+    'nonce too low',
+    'nonce too high',
+    'invalid nonce',
+    'already known',
+    'known transaction',
+    'replacement transaction underpriced',
+)
+
+
+def is_nonce_error(ex: Exception) -> bool:
+    message = str(ex).lower()
+    return any(error in message for error in NONCE_ERRORS)
+
+
+class NonceManager:
+    """Hands out nonces for one wallet locally after seeding once from the pending transaction count."""
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self._next: Optional[int] = None
+        self._lock = Lock()
+
+    async def allocate(self, web3: AsyncWeb3) -> int:
+        async with self._lock:
+            if self._next is None:
+                self._next = await web3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """Gives back a nonce whose transaction never reached the node."""
+        if self._next == nonce + 1:
+            self._next = nonce
+        else:
+            # Later nonces are already handed out, so the gap can only be fixed by asking the node again
+            self.resync()
+
+    def resync(self) -> None:
+        if self._next is not None:
+            logger.debug(f'[{self.address}] | Resynchronizing nonce')
+        self._next = None
+
+
+nonce_managers: Dict[Tuple[str, str], NonceManager] = {}
+
+
+def get_nonce_manager(chain_name: str, address: str) -> NonceManager:
+    key = (chain_name.upper(), address)
+    if key not in nonce_managers:
+        nonce_managers[key] = NonceManager(address)
+    return nonce_managers[key]
@@ -11,6 +11,8 @@ from web3.contract import AsyncContract
 from web3 import AsyncWeb3
 from loguru import logger
 from src.models.contracts import ERC20
+from src.utils.contracts import contracts
+from src.utils.multicall import MulticallBatcher
 
 from eth_typing import (
     Address,
@@ -20,16 +22,14 @@ from eth_typing import (
 
 class Utils:
     @staticmethod
-    def load_contract(address: str, web3: AsyncWeb3, abi: str) -> Optional[AsyncContract]:
+    def load_contract(address: str, web3: AsyncWeb3, abi_path: str) -> Optional[AsyncContract]:
         if address is None:
             return
 
-        address = web3.to_checksum_address(address)
-        return web3.eth.contract(address=address, abi=abi)
+        return contracts.contract(web3, address, abi_path)
 
     async def get_decimals(self, contract_address: str, web3: AsyncWeb3) -> int:
-        contract = self.load_contract(contract_address, web3, ERC20.abi)
-        decimals = await contract.functions.decimals().call()
+        decimals = await self.multicall.decimals(web3, contract_address)
         return decimals
 
     async def approve_token(
@@ -44,29 +44,29 @@ class Utils:
         while True:
             try:
                 spender = web3.to_checksum_address(spender)
-                contract = self.load_contract(from_token_address, web3, ERC20.abi)
-                allowance_amount = await self.check_allowance(web3, from_token_address, address_wallet, spender)
+                allowance_amount = await self.check_allowance(
+                    web3, from_token_address, address_wallet, spender, self.multicall
+                )
 
                 if amount > allowance_amount:
                     logger.debug('🛠️ | Approving token...')
-                    tx = await contract.functions.approve(
-                        spender,
-                        int(2 ** 256 - 1)
-                    ).build_transaction({
-                        'chainId': await web3.eth.chain_id,
-                        'from': address_wallet,
-                        'nonce': await web3.eth.get_transaction_count(address_wallet),
-                        'gasPrice': int(await web3.eth.gas_price * 1.2)
-                    })
-
-                    signed_tx = web3.eth.account.sign_transaction(tx, private_key=private_key)
-                    raw_tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-                    await sleep(10)
-                    tx_receipt = await web3.eth.wait_for_transaction_receipt(raw_tx_hash)
-                    while tx_receipt is None:
-                        await sleep(1)
-                        tx_receipt = await web3.eth.get_transaction_receipt(raw_tx_hash)
-                    tx_hash = web3.to_hex(raw_tx_hash)
+                    tx = await contracts.build_transaction(
+                        web3,
+                        from_token_address,
+                        ERC20.abi_path,
+                        'approve',
+                        [spender, int(2 ** 256 - 1)],
+                        {
+                            'chainId': await self.chain_state.get_chain_id(web3),
+                            'from': address_wallet,
+                            **await self.chain_state.get_fee_params(web3)
+                        }
+                    )
+
+                    tx_hash = await self.sign_transaction(tx)
+                    if not await self.wait_until_tx_finished(tx_hash):
+                        logger.error(f'Approve transaction failed | {tx_hash}')
+                        return
                     logger.success(f'✔️ | Token approved')
                     await sleep(5)
                     return tx_hash
@@ -74,6 +74,7 @@ class Utils:
                     break
             except ValueError as ex:
                 if 'max fee per gas less than block base fee' in str(ex):
+                    self.chain_state.invalidate_fees()
                     await sleep(1)
                     continue
 
@@ -86,11 +87,14 @@ class Utils:
             web3: AsyncWeb3,
             from_token_address: str,
             address_wallet: Address,
-            spender: str
+            spender: str,
+            multicall: MulticallBatcher | None = None
     ) -> Optional[int]:
         try:
-            contract = web3.eth.contract(address=web3.to_checksum_address(from_token_address),
-                                         abi=ERC20.abi)
+            if multicall is not None:
+                return await multicall.allowance(web3, from_token_address, address_wallet, spender)
+
+            contract = contracts.contract(web3, from_token_address, ERC20.abi_path)
             amount_approved = await contract.functions.allowance(address_wallet, spender).call()
             return amount_approved
 
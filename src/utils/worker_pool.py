@@ -0,0 +1,235 @@
+import random
+from asyncio import Future, Queue, Lock, create_task, gather, isfuture, sleep, CancelledError
+from collections import defaultdict, deque
+from functools import partial
+from time import monotonic
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+from loguru import logger
+
+from src.utils.metrics import metrics
+
+T = TypeVar('T')
+
+
+class KeyedLimiter:
+    """Counts in-flight items per key and refuses new ones above the cap. A cap of 0 means unlimited."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._active: Dict[Hashable, int] = defaultdict(int)
+
+    def try_acquire(self, key: Optional[Hashable]) -> bool:
+        if key is None or not self.limit:
+            return True
+        if self._active[key] >= self.limit:
+            return False
+        self._active[key] += 1
+        return True
+
+    def release(self, key: Optional[Hashable]) -> None:
+        if key is None or not self.limit:
+            return
+        self._active[key] -= 1
+        if self._active[key] <= 0:
+            del self._active[key]
+
+
+class WorkerPool(Generic[T]):
+    """Runs `handler` for every item with at most `workers` at once, within the per-proxy and per-chain caps.
+
+    An item counts as failed if its handler raises or returns False. A handler may also return a future
+    instead of finishing the item itself: its worker and chain slots are freed right away and the item is
+    counted by the future's result once it resolves (e.g. a transaction left to confirm elsewhere).
+    The proxy slot is held until then, since the item still uses its proxy.
+    `on_admit` is called for an item as soon as it holds its slots, before it waits for its start slot.
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[T], Awaitable[Any]],
+            *,
+            workers: int,
+            per_proxy: int = 0,
+            per_chain: int = 0,
+            start_spacing: float | List[float] = 0,
+            stats_interval: float = 0,
+            proxy_key: Callable[[T], Optional[Hashable]] = lambda item: None,
+            chain_keys: Callable[[T], Iterable[Hashable]] = lambda item: (),
+            on_admit: Optional[Callable[[T], None]] = None,
+            name: str = 'Pool'
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.start_spacing = start_spacing
+        self.stats_interval = stats_interval
+        self.proxy_key = proxy_key
+        self.chain_keys = chain_keys
+        self.on_admit = on_admit
+        self.name = name
+
+        self._proxy_limiter = KeyedLimiter(per_proxy)
+        self._chain_limiter = KeyedLimiter(per_chain)
+        self._queue: Queue = Queue()
+        self._parked: Dict[Hashable, Deque[T]] = defaultdict(deque)
+        self._start_lock = Lock()
+        self._last_start = 0.0
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._deferred: Set[Future] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + sum(len(parked) for parked in self._parked.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self.queue_depth,
+            'in_flight': self.in_flight,
+            'deferred': len(self._deferred),
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+    async def run(self, items: Iterable[T]) -> None:
+        for item in items:
+            self._queue.put_nowait(item)
+
+        workers = [create_task(self._worker()) for _ in range(self.workers)]
+        reporter = create_task(self._report()) if self.stats_interval else None
+        try:
+            while True:
+                await self._queue.join()
+                if not self._deferred:
+                    break
+                # A resolved future frees a proxy slot, which may bring parked items back to the queue
+                await gather(*self._deferred, return_exceptions=True)
+        finally:
+            for task in workers + ([reporter] if reporter else []):
+                task.cancel()
+            await gather(*workers, *([reporter] if reporter else []), return_exceptions=True)
+
+        logger.info(f'{self.name} | Finished: {self.completed} completed, {self.failed} failed')
+
+    def _acquire(self, item: T) -> Optional[Hashable]:
+        """Takes every limiter slot the item needs. Returns the saturated key if one of them is full."""
+        proxy_key = self.proxy_key(item)
+        if not self._proxy_limiter.try_acquire(proxy_key):
+            return 'proxy', proxy_key
+
+        taken = []
+        for chain_key in self.chain_keys(item):
+            if not self._chain_limiter.try_acquire(chain_key):
+                for key in taken:
+                    self._chain_limiter.release(key)
+                self._proxy_limiter.release(proxy_key)
+                return 'chain', chain_key
+            taken.append(chain_key)
+        return None
+
+    def _release_proxy(self, item: T) -> None:
+        proxy_key = self.proxy_key(item)
+        self._proxy_limiter.release(proxy_key)
+        self._unpark(('proxy', proxy_key))
+
+    def _release_chains(self, item: T) -> None:
+        for chain_key in self.chain_keys(item):
+            self._chain_limiter.release(chain_key)
+            self._unpark(('chain', chain_key))
+
+    def _unpark(self, key: Hashable) -> None:
+        parked = self._parked.get(key)
+        if not parked:
+            return
+        self._queue.put_nowait(parked.popleft())
+        if not parked:
+            del self._parked[key]
+
+    async def _wait_start_slot(self) -> None:
+        if not self.start_spacing:
+            return
+
+        async with self._start_lock:
+            spacing = random.uniform(self.start_spacing[0], self.start_spacing[1]) \
+                if isinstance(self.start_spacing, list) else self.start_spacing
+            delay = self._last_start + spacing - monotonic()
+            if delay > 0:
+                await sleep(delay)
+            self._last_start = monotonic()
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            saturated = self._acquire(item)
+            if saturated is not None:
+                # The item goes back to the queue once a slot for the saturated key frees up
+                self._parked[saturated].append(item)
+                self._queue.task_done()
+                continue
+
+            self.in_flight += 1
+            deferred = False
+            try:
+                if self.on_admit is not None:
+                    self.on_admit(item)
+                await self._wait_start_slot()
+                result = await self.handler(item)
+                if isfuture(result):
+                    self._deferred.add(result)
+                    result.add_done_callback(partial(self._finish_deferred, item))
+                    deferred = True
+                else:
+                    self._record(ok=result is not False)
+            except CancelledError:
+                raise
+            except Exception as ex:
+                self._record(ok=False)
+                logger.error(f'{self.name} | {ex}')
+            finally:
+                self.in_flight -= 1
+                if not deferred:
+                    self._release_proxy(item)
+                self._release_chains(item)
+                self._queue.task_done()
+
+    def _record(self, ok: bool) -> None:
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        metrics.inc('wallets', pool=self.name, outcome='completed' if ok else 'failed')
+
+    def _finish_deferred(self, item: T, future: Future) -> None:
+        self._deferred.discard(future)
+        self._release_proxy(item)
+        if future.cancelled():
+            return
+        ex = future.exception()
+        if ex is not None:
+            logger.error(f'{self.name} | {ex}')
+        self._record(ok=ex is None and future.result() is not False)
+
+    async def _report(self) -> None:
+        while True:
+            await sleep(self.stats_interval)
+            stats = self.stats()
+            logger.info(
+                f'{self.name} | Queue: {stats["queued"]} | In flight: {stats["in_flight"]} | '
+                f'Confirming: {stats["deferred"]} | '
+                f'Completed: {stats["completed"]} | Failed: {stats["failed"]}'
+            )
@@ -9,19 +9,28 @@ from typing import (
 
 from loguru import logger
 
+from src.utils.metrics import metrics
+from src.utils.wrappers.retry_policy import RetryPolicy, classify_error, default_policy
 
-def retry(retries: int, delay: int, backoff: float) -> Callable:
+
+def retry(policy: RetryPolicy = default_policy) -> Callable:
     def decorator_retry(func: Callable) -> Callable:
         @wraps(func)
         async def wrapped(*args: Optional[Any], **kwargs) -> Optional[Callable]:
-            for i in range(retries + 1):
+            attempt = 0
+            while True:
                 try:
                     return await func(*args, **kwargs)
                 except Exception as ex:
-                    if i == retries:
+                    delay = policy.next_delay(ex, attempt)
+                    if delay is None:
+                        metrics.inc('failures', function=func.__name__, kind=classify_error(ex).value)
                         logger.error(f'{ex} | {func.__name__}')
-                    else:
-                        await sleep(delay * (backoff ** i))
+                        return
+                    metrics.inc('retries', function=func.__name__, kind=classify_error(ex).value)
+                    logger.debug(f'{classify_error(ex).value} error in {func.__name__}, retrying in {delay:.1f}s | {ex}')
+                    await sleep(delay)
+                    attempt += 1
 
         return wrapped
 
@@ -0,0 +1,112 @@
+import random
+from asyncio import TimeoutError
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Optional
+
+from aiohttp import ClientError, ClientResponseError
+from web3.exceptions import ContractLogicError, Web3RPCError
+
+from config import RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RATE_LIMIT_DELAY
+from src.utils.user.nonce_manager import is_nonce_error
+
+RATE_LIMIT_ERRORS = (
+    'rate limit',
+    'too many requests',
+    'request limit',
+    'limit exceeded',
+)
+REVERT_ERRORS = (
+    'execution reverted',
+    'insufficient funds',
+    'gas required exceeds',
+    'intrinsic gas too low',
+    'transfer amount exceeds',
+)
+
+
+class ErrorKind(str, Enum):
+    TRANSIENT = 'transient'
+    RATE_LIMIT = 'rate limit'
+    NONCE = 'nonce'
+    REVERT = 'revert'
+
+
+def classify_error(ex: BaseException) -> ErrorKind:
+    if isinstance(ex, ClientResponseError):
+        return ErrorKind.RATE_LIMIT if ex.status == 429 else ErrorKind.TRANSIENT
+    if isinstance(ex, (ClientError, TimeoutError, ConnectionError)):
+        return ErrorKind.TRANSIENT
+    if isinstance(ex, ContractLogicError):
+        return ErrorKind.REVERT
+
+    message = str(ex).lower()
+    if is_nonce_error(ex):
+        return ErrorKind.NONCE
+    if any(error in message for error in REVERT_ERRORS):
+        return ErrorKind.REVERT
+    if isinstance(ex, Web3RPCError) and any(error in message for error in RATE_LIMIT_ERRORS):
+        return ErrorKind.RATE_LIMIT
+    return ErrorKind.TRANSIENT
+
+
+def get_retry_after(ex: BaseException) -> Optional[float]:
+    """Seconds asked for by the Retry-After header of a failed response, if there was one."""
+    headers = getattr(ex, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decides whether and when a failed wallet task is tried again, based on what kind of error it hit.
+
+    Reverts fail at once, since running the task again would only revert again. Nonce errors are retried
+    almost immediately because the nonce manager has already resynced. Rate limits wait for Retry-After
+    when the server sent one, everything else backs off exponentially from `base_delay` with jitter.
+    """
+
+    def __init__(
+            self,
+            retries: int = RETRY_ATTEMPTS,
+            base_delay: float = RETRY_BASE_DELAY,
+            max_delay: float = RETRY_MAX_DELAY,
+            rate_limit_delay: float = RATE_LIMIT_DELAY
+    ) -> None:
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+
+    def next_delay(self, ex: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before attempt number `attempt + 1`, or None if the task should give up."""
+        kind = classify_error(ex)
+        if kind == ErrorKind.REVERT or attempt >= self.retries:
+            return None
+
+        if kind == ErrorKind.RATE_LIMIT:
+            retry_after = get_retry_after(ex)
+            if retry_after is not None:
+                return retry_after
+            base_delay = self.rate_limit_delay
+        elif kind == ErrorKind.NONCE:
+            base_delay = 0.5
+        else:
+            base_delay = self.base_delay
+
+        delay = min(self.max_delay, base_delay * 2 ** attempt)
+        # Half fixed, half random, so wallets that failed together do not all come back together
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+default_policy = RetryPolicy()
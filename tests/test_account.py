@@ -0,0 +1,135 @@
+import asyncio
+
+from src.utils.user import account as account_module
+from src.utils.user.account import Account
+
+TX = {'nonce': 7, 'maxFeePerGas': 100, 'maxPriorityFeePerGas': 10}
+
+
+class FakeChainState:
+    def __init__(self, fees: dict) -> None:
+        self.fees = fees
+
+    async def get_fee_params(self, web3) -> dict:
+        return dict(self.fees)
+
+
+class FakeNonceManager:
+    def __init__(self) -> None:
+        self.resyncs = 0
+
+    def resync(self) -> None:
+        self.resyncs += 1
+
+
+class FakeWatcher:
+    """Never sees the hashes in a block, as if they were mined between two waits."""
+
+    def __init__(self) -> None:
+        self.waits = []
+
+    async def wait(self, tx_hashes, **kwargs):
+        self.waits.append(list(tx_hashes))
+        return None
+
+
+class FakeProvider:
+    endpoint_uris = ['http://rpc']
+
+
+class FakeWeb3:
+    provider = FakeProvider()
+
+
+def make_account(monkeypatch, fees: dict | None = None) -> tuple[Account, FakeWatcher]:
+    account = Account.__new__(Account)
+    account.wallet_address = '0xwallet'
+    account.proxy = None
+    account.chain_name = 'BASE'
+    account.web3 = FakeWeb3()
+    account.chain_state = FakeChainState(fees or {})
+    account.nonce_manager = FakeNonceManager()
+    account.sent_transactions = {}
+    account.original_fees = {}
+
+    watcher = FakeWatcher()
+    monkeypatch.setattr(account_module, 'get_receipt_watcher', lambda chain_name: watcher)
+    monkeypatch.setattr(account_module, 'REPLACE_FEE_BUMP', 0.5)
+    monkeypatch.setattr(account_module, 'REPLACE_MAX_FEE_MULTIPLIER', 2)
+    return account, watcher
+
+
+def test_bump_fees_raises_fees_up_to_the_cap(monkeypatch):
+    account, _ = make_account(monkeypatch)
+
+    first = asyncio.run(account.bump_fees(TX))
+    assert first == {'nonce': 7, 'maxFeePerGas': 151, 'maxPriorityFeePerGas': 16}
+    second = asyncio.run(account.bump_fees(first))
+    assert second == {'nonce': 7, 'maxFeePerGas': 200, 'maxPriorityFeePerGas': 20}
+    assert asyncio.run(account.bump_fees(second)) is None
+
+
+def test_bump_fees_follows_the_current_fees(monkeypatch):
+    account, _ = make_account(monkeypatch, fees={'maxFeePerGas': 180, 'maxPriorityFeePerGas': 12})
+    assert asyncio.run(account.bump_fees(TX)) == {'nonce': 7, 'maxFeePerGas': 180, 'maxPriorityFeePerGas': 16}
+
+
+def test_stuck_tx_is_replaced_and_the_replacement_confirms(monkeypatch):
+    account, watcher = make_account(monkeypatch)
+    account.sent_transactions['0xa'] = dict(TX)
+    sent = []
+    lookups = []
+
+    async def send_transaction(tx):
+        sent.append(tx)
+        return f'0x{len(sent)}'
+
+    async def find_receipt(hashes):
+        lookups.append(list(hashes))
+        if len(lookups) == 1:
+            raise ConnectionError('rpc dropped')
+        return {'status': 1} if len(hashes) > 1 else None
+
+    account.send_transaction = send_transaction
+    account.find_receipt = find_receipt
+
+    assert asyncio.run(account._wait_until_tx_finished('0xa', 60)) is True
+    # The failed lookup did not end the wait, and the next pass looked up both hashes
+    assert lookups == [['0xa'], ['0xa', '0x1']]
+    assert [tx['maxFeePerGas'] for tx in sent] == [151]
+    assert account.original_fees == {}
+
+
+def test_receipts_are_looked_up_after_the_fee_cap(monkeypatch):
+    account, watcher = make_account(monkeypatch)
+    account.sent_transactions['0xa'] = dict(TX, maxFeePerGas=200, maxPriorityFeePerGas=20)
+    account.original_fees[7] = {'maxFeePerGas': 100, 'maxPriorityFeePerGas': 10}
+    lookups = []
+
+    async def find_receipt(hashes):
+        lookups.append(list(hashes))
+        return {'status': 1} if len(lookups) == 3 else None
+
+    account.find_receipt = find_receipt
+
+    assert asyncio.run(account._wait_until_tx_finished('0xa', 60)) is True
+    assert len(watcher.waits) == 3
+
+
+def test_fee_errors_keep_waiting(monkeypatch):
+    account, _ = make_account(monkeypatch)
+    account.sent_transactions['0xa'] = dict(TX)
+    lookups = []
+
+    async def get_fee_params(web3):
+        raise ConnectionError('rpc dropped')
+
+    async def find_receipt(hashes):
+        lookups.append(list(hashes))
+        return {'status': 1} if len(lookups) == 2 else None
+
+    account.chain_state.get_fee_params = get_fee_params
+    account.find_receipt = find_receipt
+
+    assert asyncio.run(account._wait_until_tx_finished('0xa', 60)) is True
+    assert lookups == [['0xa'], ['0xa']]
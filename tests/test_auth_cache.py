@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import json
+from time import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.base_models.pydantic_manager import DataBaseManagerConfig
+from src.database.models import init_models
+from src.database.utils.db_manager import DataBaseUtils
+from src.superform.auth_cache import AuthTokenCache, get_token_expiry
+
+
+def make_token(claims: dict) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+
+class FakeDataBaseUtils:
+    def __init__(self, stored: dict | None = None) -> None:
+        self.stored = dict(stored or {})
+        self.writes = []
+
+    async def get_auth_tokens(self, valid_after: int) -> dict:
+        return {key: entry for key, entry in self.stored.items() if entry[1] > valid_after}
+
+    async def save_auth_tokens(self, tokens: dict) -> None:
+        self.writes.append(dict(tokens))
+
+
+def make_cache(stored: dict | None = None) -> tuple[AuthTokenCache, FakeDataBaseUtils]:
+    cache = AuthTokenCache(refresh_margin=60, flush_interval=0.01)
+    db_utils = FakeDataBaseUtils(stored)
+    cache._db_utils = db_utils
+    return cache, db_utils
+
+
+def test_get_token_expiry():
+    assert get_token_expiry(make_token({'exp': 1700000000, 'sub': 'wallet'})) == 1700000000
+    assert get_token_expiry(make_token({'sub': 'wallet'})) is None
+    assert get_token_expiry('not-a-jwt') is None
+    assert get_token_expiry('header.%%%.signature') is None
+
+
+def test_token_is_handed_out_until_the_refresh_margin():
+    async def scenario():
+        cache, _ = make_cache()
+        cache.put('fresh', make_token({'exp': int(time()) + 120}))
+        cache.put('expiring', make_token({'exp': int(time()) + 30}))
+        cache.put('no-exp', make_token({'sub': 'wallet'}))
+        return [await cache.get(key) is not None for key in ('fresh', 'expiring', 'no-exp')], cache.stats()
+
+    found, stats = asyncio.run(scenario())
+    assert found == [True, False, False]
+    assert stats == {'hits': 1, 'misses': 2, 'size': 1}
+
+
+def test_saved_tokens_are_loaded_once():
+    stored = {'a': ('token-a', int(time()) + 600), 'b': ('token-b', int(time()) + 10)}
+
+    async def scenario():
+        cache, _ = make_cache(stored)
+        return await cache.get('a'), await cache.get('b')
+
+    assert asyncio.run(scenario()) == ('token-a', None)
+
+
+def test_writes_happen_in_the_background():
+    token = make_token({'exp': int(time()) + 600})
+
+    async def scenario():
+        cache, db_utils = make_cache()
+        cache.put('a', token)
+        cache.put('b', token)
+        # Nothing is written while the wallet goes on
+        written_at_once = list(db_utils.writes)
+        await asyncio.sleep(0.05)
+        cache.invalidate('a')
+        cache.invalidate('never-saved')
+        await cache.close()
+        return written_at_once, db_utils.writes
+
+    written_at_once, writes = asyncio.run(scenario())
+    assert written_at_once == []
+    assert writes == [
+        {'a': (token, get_token_expiry(token)), 'b': (token, get_token_expiry(token))},
+        {'a': (None, 0)},
+    ]
+
+
+def test_save_auth_tokens_upserts_and_deletes(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+        await init_models(engine)
+        db_utils = DataBaseUtils(manager_config=DataBaseManagerConfig(action='auth_tokens'))
+        db_utils.session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+        await db_utils.save_auth_tokens({'a': ('old', 2000), 'b': ('token-b', 2000), 'c': ('token-c', 1000)})
+        await db_utils.save_auth_tokens({'a': ('new', 3000), 'b': (None, 0)})
+        tokens = await db_utils.get_auth_tokens(1500)
+        await engine.dispose()
+        return tokens
+
+    assert asyncio.run(scenario()) == {'a': ('new', 3000)}
@@ -0,0 +1,71 @@
+import asyncio
+
+from src.utils import chain_state as chain_state_module
+from src.utils.chain_state import CachedValue
+
+
+class Fetcher:
+    def __init__(self, delay: float = 0.01) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.calls
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def run() -> tuple:
+        value, fetch = CachedValue(ttl=60), Fetcher()
+        results = await asyncio.gather(*[value.get(fetch) for _ in range(10)])
+        return results, fetch.calls
+
+    results, calls = asyncio.run(run())
+    assert results == [1] * 10
+    assert calls == 1
+
+
+def test_value_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(chain_state_module, 'monotonic', lambda: now[0])
+
+    async def run() -> list:
+        value, fetch = CachedValue(ttl=5), Fetcher(delay=0)
+        results = [await value.get(fetch)]
+        now[0] = 104
+        results.append(await value.get(fetch))
+        now[0] = 106
+        results.append(await value.get(fetch))
+        return results
+
+    assert asyncio.run(run()) == [1, 1, 2]
+
+
+def test_failed_fetch_reaches_every_caller_and_is_not_cached():
+    async def run() -> tuple:
+        value = CachedValue(ttl=60)
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError('rpc down')
+
+        results = await asyncio.gather(*[value.get(fail) for _ in range(3)], return_exceptions=True)
+        return results, await value.get(Fetcher())
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == 1
+
+
+def test_cancelled_caller_does_not_strand_the_others():
+    async def run() -> tuple:
+        value, fetch = CachedValue(ttl=60), Fetcher(delay=0.05)
+        first = asyncio.create_task(value.get(fetch))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(value.get(fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await asyncio.wait_for(second, 1), fetch.calls
+
+    assert asyncio.run(run()) == (1, 1)
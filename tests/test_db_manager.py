@@ -0,0 +1,88 @@
+import asyncio
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.base_models.pydantic_manager import DataBaseManagerConfig
+from src.database.models import WalletsTasks, WorkingWallets, init_models
+from src.database.utils.db_manager import DataBaseUtils
+
+
+def make_utils(engine) -> DataBaseUtils:
+    db_utils = DataBaseUtils(manager_config=DataBaseManagerConfig(action='wallets_tasks'))
+    db_utils.session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    return db_utils
+
+
+async def read_statuses(engine) -> tuple[dict, dict]:
+    async with AsyncSession(engine) as session:
+        wallets = dict((await session.execute(select(WorkingWallets.private_key, WorkingWallets.status))).all())
+        tasks = {
+            (private_key, task_name): status
+            for private_key, task_name, status in (await session.execute(
+                select(WalletsTasks.private_key, WalletsTasks.task_name, WalletsTasks.status)
+            )).all()
+        }
+    return wallets, tasks
+
+
+def test_update_tasks_status_upserts_and_completes_wallets(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+        await init_models(engine)
+        async with AsyncSession(engine) as session:
+            session.add_all([
+                WorkingWallets(private_key='a', status='pending'),
+                WorkingWallets(private_key='b', status='pending'),
+                WalletsTasks(private_key='a', task_name='DEPOSIT', status='pending'),
+                WalletsTasks(private_key='b', task_name='DEPOSIT', status='pending'),
+                WalletsTasks(private_key='b', task_name='WITHDRAW', status='pending'),
+            ])
+            await session.commit()
+
+        await make_utils(engine).update_tasks_status([
+            {'private_key': 'a', 'task_name': 'DEPOSIT', 'status': 'completed'},
+            {'private_key': 'b', 'task_name': 'DEPOSIT', 'status': 'completed'},
+            # A task with no row yet is inserted
+            {'private_key': 'a', 'task_name': 'REFERRAL', 'status': 'completed'},
+        ])
+        statuses = await read_statuses(engine)
+        await engine.dispose()
+        return statuses
+
+    wallets, tasks = asyncio.run(scenario())
+    assert wallets == {'a': 'completed', 'b': 'pending'}
+    assert tasks == {
+        ('a', 'DEPOSIT'): 'completed',
+        ('a', 'REFERRAL'): 'completed',
+        ('b', 'DEPOSIT'): 'completed',
+        ('b', 'WITHDRAW'): 'pending',
+    }
+
+
+def test_init_models_adds_unique_keys_to_old_databases(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "old.db"}')
+        async with engine.begin() as connection:
+            # Tables as created by versions without unique keys, with a task written twice
+            await connection.execute(text(
+                'CREATE TABLE wallets_tasks (id INTEGER PRIMARY KEY, private_key VARCHAR, '
+                'task_name VARCHAR, status VARCHAR)'
+            ))
+            await connection.execute(text(
+                "INSERT INTO wallets_tasks (private_key, task_name, status) VALUES "
+                "('a', 'DEPOSIT', 'pending'), ('a', 'DEPOSIT', 'completed'), ('a', 'WITHDRAW', 'pending')"
+            ))
+        await init_models(engine)
+
+        await make_utils(engine).update_tasks_status([
+            {'private_key': 'a', 'task_name': 'WITHDRAW', 'status': 'completed'},
+        ])
+        statuses = await read_statuses(engine)
+        await engine.dispose()
+        return statuses
+
+    _, tasks = asyncio.run(scenario())
+    # The latest of the duplicates is kept, and the upsert then updates the row in place
+    assert tasks == {('a', 'DEPOSIT'): 'completed', ('a', 'WITHDRAW'): 'completed'}
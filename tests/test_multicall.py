@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from eth_abi import decode, encode
+from web3 import Web3
+
+from src.utils import multicall as multicall_module
+from src.utils.multicall import AGGREGATE3, BALANCE_OF, DECIMALS, GET_ETH_BALANCE, MulticallBatcher
+
+TOKEN = '0x833589fcd6edb6e08f4c7c32d4f71b54bda02913'
+OWNER = '0x0000000000000000000000000000000000000001'
+
+
+class FakeEth:
+    """Answers aggregate3 with one result per call: balances, decimals, or a revert for unknown selectors."""
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    async def call(self, tx: dict) -> bytes:
+        assert tx['data'][:4] == AGGREGATE3
+        (calls,) = decode(['(address,bool,bytes)[]'], tx['data'][4:])
+        self.batches.append(len(calls))
+        results = []
+        for target, allow_failure, call_data in calls:
+            assert allow_failure
+            selector = call_data[:4]
+            if selector == GET_ETH_BALANCE:
+                results.append((True, encode(['uint256'], [10 ** 18])))
+            elif selector == BALANCE_OF:
+                results.append((True, encode(['uint256'], [5_000_000])))
+            elif selector == DECIMALS:
+                results.append((True, encode(['uint8'], [6])))
+            else:
+                results.append((False, b''))
+        return encode(['(bool,bytes)[]'], [results])
+
+
+class FakeWeb3:
+    def __init__(self) -> None:
+        self.eth = FakeEth()
+
+    @staticmethod
+    def to_checksum_address(address: str) -> str:
+        return Web3.to_checksum_address(address)
+
+
+def test_calls_are_batched_and_decoded(monkeypatch):
+    monkeypatch.setattr(multicall_module, 'MULTICALL_WINDOW', 0.01)
+    monkeypatch.setattr(multicall_module, 'MULTICALL_MAX_BATCH', 100)
+
+    async def scenario():
+        web3 = FakeWeb3()
+        batcher = MulticallBatcher('BASE')
+        results = await asyncio.gather(
+            batcher.native_balance(web3, OWNER),
+            batcher.balance_of(web3, TOKEN, OWNER),
+            batcher.decimals(web3, TOKEN),
+        )
+        # Decimals are kept per token, so asking again sends nothing
+        results.append(await batcher.decimals(web3, TOKEN.upper().replace('0X', '0x')))
+        return results, web3.eth.batches
+
+    results, batches = asyncio.run(scenario())
+    assert results == [10 ** 18, 5_000_000, 6, 6]
+    assert batches == [3]
+
+
+def test_full_batch_is_sent_without_waiting(monkeypatch):
+    monkeypatch.setattr(multicall_module, 'MULTICALL_WINDOW', 60)
+    monkeypatch.setattr(multicall_module, 'MULTICALL_MAX_BATCH', 2)
+
+    async def scenario():
+        web3 = FakeWeb3()
+        batcher = MulticallBatcher('BASE')
+        balances = await asyncio.wait_for(
+            asyncio.gather(batcher.balance_of(web3, TOKEN, OWNER), batcher.native_balance(web3, OWNER)), 1
+        )
+        return balances, web3.eth.batches
+
+    assert asyncio.run(scenario()) == ([5_000_000, 10 ** 18], [2])
+
+
+def test_reverted_call_fails_only_its_caller(monkeypatch):
+    monkeypatch.setattr(multicall_module, 'MULTICALL_WINDOW', 0.01)
+
+    async def scenario():
+        web3 = FakeWeb3()
+        batcher = MulticallBatcher('BASE')
+        return await asyncio.gather(
+            batcher.balance_of(web3, TOKEN, OWNER),
+            batcher.allowance(web3, TOKEN, OWNER, OWNER),
+            return_exceptions=True
+        )
+
+    balance, allowance = asyncio.run(scenario())
+    assert balance == 5_000_000
+    with pytest.raises(ValueError, match='reverted'):
+        raise allowance
@@ -0,0 +1,66 @@
+import asyncio
+
+from src.utils.user.nonce_manager import NonceManager, get_nonce_manager, is_nonce_error
+
+
+class FakeEth:
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.calls = 0
+
+    async def get_transaction_count(self, address: str, block: str) -> int:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.count
+
+
+class FakeWeb3:
+    def __init__(self, count: int) -> None:
+        self.eth = FakeEth(count)
+
+
+def test_concurrent_allocations_get_distinct_nonces():
+    async def scenario():
+        manager = NonceManager('0xwallet')
+        web3 = FakeWeb3(5)
+        nonces = await asyncio.gather(*[manager.allocate(web3) for _ in range(4)])
+        return nonces, web3.eth.calls
+
+    nonces, calls = asyncio.run(scenario())
+    assert sorted(nonces) == [5, 6, 7, 8]
+    assert calls == 1
+
+
+def test_release_of_the_last_nonce_reuses_it():
+    async def scenario():
+        manager = NonceManager('0xwallet')
+        web3 = FakeWeb3(5)
+        nonce = await manager.allocate(web3)
+        manager.release(nonce)
+        return await manager.allocate(web3), web3.eth.calls
+
+    assert asyncio.run(scenario()) == (5, 1)
+
+
+def test_release_with_later_nonces_out_resyncs():
+    async def scenario():
+        manager = NonceManager('0xwallet')
+        web3 = FakeWeb3(5)
+        first = await manager.allocate(web3)
+        await manager.allocate(web3)
+        manager.release(first)
+        web3.eth.count = 6
+        return await manager.allocate(web3), web3.eth.calls
+
+    assert asyncio.run(scenario()) == (6, 2)
+
+
+def test_is_nonce_error():
+    assert is_nonce_error(ValueError('Nonce too low: next nonce 5, tx nonce 4'))
+    assert is_nonce_error(ValueError('replacement transaction underpriced'))
+    assert not is_nonce_error(ValueError('execution reverted'))
+
+
+def test_one_manager_per_chain_and_wallet():
+    assert get_nonce_manager('base', '0xtest') is get_nonce_manager('BASE', '0xtest')
+    assert get_nonce_manager('base', '0xtest') is not get_nonce_manager('optimism', '0xtest')
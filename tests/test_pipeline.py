@@ -0,0 +1,70 @@
+import asyncio
+
+from src.utils.pipeline import Pipeline
+from src.utils.wrappers.retry_policy import RetryPolicy
+
+
+class FakeSuperForm:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def sign_transaction(self, tx: dict) -> str:
+        self.sent += 1
+        return f'0xhash{self.sent}'
+
+
+def make_pipeline() -> Pipeline:
+    return Pipeline(
+        prepare_workers=1, submit_workers=1, confirm_workers=1, queue_size=4,
+        policy=RetryPolicy(retries=3, base_delay=0, max_delay=0)
+    )
+
+
+def test_confirm_failure_retries_the_same_hash():
+    async def scenario():
+        pipeline = make_pipeline()
+        pipeline.start()
+        superform = FakeSuperForm()
+        prepared, confirmed = [], []
+
+        async def prepare():
+            prepared.append(1)
+            return {'to': '0x0'}
+
+        async def confirm(tx_hash: str):
+            confirmed.append(tx_hash)
+            if len(confirmed) == 1:
+                raise ConnectionError('rpc dropped')
+            return True
+
+        result = await pipeline.run(superform, prepare, confirm)
+        await pipeline.close()
+        return result, prepared, confirmed, superform.sent
+
+    result, prepared, confirmed, sent = asyncio.run(scenario())
+    assert result is True
+    assert prepared == [1]
+    assert sent == 1
+    assert confirmed == ['0xhash1', '0xhash1']
+
+
+def test_prepare_failure_prepares_again():
+    async def scenario():
+        pipeline = make_pipeline()
+        pipeline.start()
+        prepared = []
+
+        async def prepare():
+            prepared.append(1)
+            if len(prepared) == 1:
+                raise ConnectionError('api dropped')
+            return {'to': '0x0'}
+
+        async def confirm(tx_hash: str):
+            return True
+
+        result = await pipeline.run(FakeSuperForm(), prepare, confirm)
+        await pipeline.close()
+        return result, prepared
+
+    assert asyncio.run(scenario()) == (True, [1, 1])
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from src.utils import proxy_manager
+from src.utils.proxy_manager import ProxyPool
+
+
+@pytest.fixture
+def rotations(monkeypatch) -> list:
+    rotated = []
+
+    async def change_ip(self) -> bool:
+        rotated.append(self.proxy_url)
+        return True
+
+    monkeypatch.setattr(proxy_manager, 'MOBILE_PROXY', True)
+    monkeypatch.setattr(proxy_manager, 'ROTATE_IP', True)
+    monkeypatch.setattr(proxy_manager.Proxy, 'change_ip', change_ip)
+    return rotated
+
+
+def test_ip_changes_only_after_the_last_wallet(rotations):
+    async def run() -> list:
+        pool = ProxyPool(max_users=0)
+        proxy = pool.register('http://a', 'change-a')
+        first, second = await pool.acquire(proxy), await pool.acquire(proxy)
+        pool.release(first)
+        await asyncio.sleep(0)
+        seen = list(rotations)
+        pool.release(second)
+        await asyncio.sleep(0)
+        return seen
+
+    assert asyncio.run(run()) == []
+    assert rotations == ['http://a']
+
+
+def test_borrowers_prefer_proxies_with_room(rotations):
+    async def run() -> tuple:
+        pool = ProxyPool(max_users=1)
+        dead = pool.register('http://dead', 'change-dead')
+        busy, idle = pool.register('http://busy', 'change-busy'), pool.register('http://idle', 'change-idle')
+        dead.quarantined_until = float('inf')
+        busy.latency, idle.latency = 0.1, 0.5
+
+        own = await pool.acquire(busy)
+        # Never waits for room, the cap is the worker pool's
+        borrowers = [await asyncio.wait_for(pool.acquire(dead), 1) for _ in range(2)]
+        return own, borrowers, busy.users, idle.users
+
+    own, borrowers, busy_users, idle_users = asyncio.run(run())
+    assert own.proxy_url == 'http://busy'
+    assert [proxy.proxy_url for proxy in borrowers] == ['http://idle', 'http://busy']
+    assert (busy_users, idle_users) == (2, 1)
+    assert rotations == []
+
+
+def test_acquire_waits_for_the_ip_change(rotations):
+    async def run() -> list:
+        pool = ProxyPool(max_users=0)
+        proxy = pool.register('http://a', 'change-a')
+        pool.release(await pool.acquire(proxy))
+        assert proxy.is_rotating
+        await pool.acquire(proxy)
+        return [proxy.is_rotating, list(rotations)]
+
+    assert asyncio.run(run()) == [False, ['http://a']]
@@ -0,0 +1,83 @@
+from src.superform import quote_cache as quote_cache_module
+from src.superform.quote_cache import QuoteCache, quote_targets, rebind
+
+ADDRESS = '0xAbC0000000000000000000000000000000000001'
+OTHER = '0xDef0000000000000000000000000000000000002'
+
+
+def test_rebind_replaces_case_insensitively():
+    route = {'user': ADDRESS.lower(), 'items': [{'refund': ADDRESS, 'amount': '1.5'}], 'chain': 8453}
+    assert rebind(route, {ADDRESS.lower(): OTHER, '1.5': '2.0'}) == {
+        'user': OTHER, 'items': [{'refund': OTHER, 'amount': '2.0'}], 'chain': 8453
+    }
+
+
+def test_rebind_counts_replacements():
+    counts = {}
+    rebind({'user': ADDRESS, 'refund': ADDRESS.lower(), 'amount': '1.5'}, {ADDRESS.lower(): OTHER}, counts)
+    assert counts == {ADDRESS.lower(): 2}
+
+
+def test_get_rebinds_template_to_the_new_wallet():
+    cache = QuoteCache(ttl=60, max_size=10)
+    cache.put('key', {'user_address': ADDRESS, 'amount_in': '1.0'}, {'address': ADDRESS, 'amount': '1.0'})
+    assert cache.get('key', {'address': OTHER, 'amount': '1.0'}) == {'user_address': OTHER, 'amount_in': '1.0'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_binding_missing_from_route_is_a_miss():
+    cache = QuoteCache(ttl=60, max_size=10)
+    # The API echoed the amount in another format, so the route cannot be rebound to another wallet
+    cache.put('key', {'user_address': ADDRESS, 'amount_in': '1.00'}, {'address': ADDRESS, 'amount': '1.0'})
+    assert cache.get('key', {'address': OTHER, 'amount': '1.0'}) is None
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'size': 0}
+
+
+def test_unknown_binding_is_a_miss():
+    cache = QuoteCache(ttl=60, max_size=10)
+    cache.put('key', {'user_address': ADDRESS}, {'address': ADDRESS})
+    assert cache.get('key', {'address': OTHER, 'balance_0': '5'}) is None
+
+
+def test_cached_route_is_a_copy():
+    cache = QuoteCache(ttl=60, max_size=10)
+    route = {'items': [1]}
+    cache.put('key', route, {})
+    route['items'].append(2)
+    assert cache.get('key', {}) == {'items': [1]}
+
+
+def test_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(quote_cache_module, 'monotonic', lambda: now[0])
+    cache = QuoteCache(ttl=20, max_size=10)
+    cache.put('key', {'route': 1}, {})
+    now[0] = 119
+    assert cache.get('key', {}) == {'route': 1}
+    now[0] = 121
+    assert cache.get('key', {}) is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0}
+
+
+def test_zero_ttl_disables_cache():
+    cache = QuoteCache(ttl=0, max_size=10)
+    cache.put('key', {'route': 1}, {})
+    assert cache.get('key', {}) is None
+
+
+def test_lru_eviction():
+    cache = QuoteCache(ttl=60, max_size=2)
+    cache.put('a', {'route': 'a'}, {})
+    cache.put('b', {'route': 'b'}, {})
+    assert cache.get('a', {}) is not None
+    cache.put('c', {'route': 'c'}, {})
+    assert cache.get('b', {}) is None
+    assert cache.get('a', {}) is not None
+    assert cache.get('c', {}) is not None
+
+
+def test_quote_targets():
+    data = '0x12345678' + ADDRESS.lower()[2:].rjust(64, '0') + f'{10 ** 18:064x}'
+    assert quote_targets(data, ADDRESS, [10 ** 18])
+    assert not quote_targets(data, OTHER, [10 ** 18])
+    assert not quote_targets(data, ADDRESS, [2 * 10 ** 18])
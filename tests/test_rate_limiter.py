@@ -0,0 +1,65 @@
+import asyncio
+from time import monotonic
+
+from src.utils.request_client import client as client_module
+from src.utils.request_client.client import RequestClient
+from src.utils.request_client.rate_limiter import RateLimiterRegistry, TokenBucket
+
+
+async def acquire_many(bucket: TokenBucket, count: int) -> float:
+    started_at = monotonic()
+    for _ in range(count):
+        await bucket.acquire()
+    return monotonic() - started_at
+
+
+def test_burst_goes_through_at_once():
+    assert asyncio.run(acquire_many(TokenBucket(rate=1, burst=5), 5)) < 0.05
+
+
+def test_rate_after_burst():
+    # One token up front, then one every 1/20 s
+    elapsed = asyncio.run(acquire_many(TokenBucket(rate=20, burst=1), 6))
+    assert 0.24 <= elapsed < 0.5
+
+
+def test_concurrent_waiters_share_the_rate():
+    async def run() -> float:
+        bucket = TokenBucket(rate=50, burst=1)
+        started_at = monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(11)])
+        return monotonic() - started_at
+
+    assert 0.19 <= asyncio.run(run()) < 0.4
+
+
+def test_registry_shares_buckets_per_host():
+    registry = RateLimiterRegistry()
+    bucket = registry.get('https://example.com/a')
+    assert registry.get('https://example.com/b') is bucket
+    assert registry.get('https://example.org/a') is not bucket
+
+
+def test_token_is_taken_before_the_proxy_call(monkeypatch):
+    events = []
+
+    class FakeLimiters:
+        async def acquire(self, url, proxy_url):
+            events.append('acquire')
+
+    class FakePool:
+        async def call(self, proxy_url, request):
+            events.append('proxy')
+            return await request()
+
+    async def send_request(*args):
+        events.append('request')
+        return {'ok': True}
+
+    monkeypatch.setattr(client_module, 'rate_limiters', FakeLimiters())
+    monkeypatch.setattr(client_module, 'proxy_pool', FakePool())
+    request_client = RequestClient(None)
+    monkeypatch.setattr(request_client, '_send_request', send_request)
+
+    assert asyncio.run(request_client.make_request(url='https://example.com/a')) == {'ok': True}
+    assert events == ['acquire', 'proxy', 'request']
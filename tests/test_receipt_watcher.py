@@ -0,0 +1,111 @@
+import asyncio
+
+from src.utils import receipt_watcher as receipt_watcher_module
+from src.utils.receipt_watcher import ReceiptWatcher
+
+
+class FakeBatch:
+    def __init__(self, web3: 'FakeWeb3') -> None:
+        self.web3 = web3
+        self.calls = []
+
+    async def __aenter__(self) -> 'FakeBatch':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def add(self, call: tuple) -> None:
+        self.calls.append(call)
+
+    async def async_execute(self) -> list:
+        results = []
+        for kind, value in self.calls:
+            if kind == 'block':
+                results.append({'transactions': self.web3.blocks.get(value, [])})
+            else:
+                self.web3.receipt_requests.append(value)
+                results.append({'transactionHash': value, 'blockNumber': self.web3.included[value], 'status': 1})
+        return results
+
+
+class FakeEth:
+    def __init__(self, web3: 'FakeWeb3') -> None:
+        self.web3 = web3
+
+    @property
+    def block_number(self):
+        async def next_block() -> int:
+            self.web3.head += 1
+            return self.web3.head
+        return next_block()
+
+    def get_block(self, number: int) -> tuple:
+        return 'block', number
+
+    def get_transaction_receipt(self, tx_hash: str) -> tuple:
+        return 'receipt', tx_hash
+
+
+class FakeWeb3:
+    """A chain that grows by one block every time the head is read."""
+
+    def __init__(self, head: int, blocks: dict) -> None:
+        self.head = head
+        self.blocks = blocks
+        self.included = {tx_hash: number for number, hashes in blocks.items() for tx_hash in hashes}
+        self.receipt_requests = []
+        self.eth = FakeEth(self)
+
+    def batch_requests(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def to_hex(self, value: str) -> str:
+        return value
+
+
+def make_watcher(monkeypatch, web3: FakeWeb3) -> ReceiptWatcher:
+    monkeypatch.setattr(receipt_watcher_module, 'RECEIPT_POLL_INTERVAL', 0)
+    monkeypatch.setattr(receipt_watcher_module, 'RECEIPT_LOOKBACK_BLOCKS', 1)
+    monkeypatch.setattr(receipt_watcher_module, 'RECEIPT_MAX_BLOCKS_PER_POLL', 10)
+    watcher = ReceiptWatcher('BASE')
+    watcher._web3 = web3
+    return watcher
+
+
+def test_receipt_resolves_after_confirmations(monkeypatch):
+    web3 = FakeWeb3(head=100, blocks={101: ['0xother', '0xaa']})
+    watcher = make_watcher(monkeypatch, web3)
+
+    receipt = asyncio.run(watcher.wait('0xAA', rpc='http://rpc', proxy=None, confirmations=3, timeout=5))
+    assert receipt['transactionHash'] == '0xaa'
+    assert web3.head == 103
+    # Only included hashes have their receipt fetched, and only once
+    assert web3.receipt_requests == ['0xaa']
+    assert watcher.pending == 0
+
+
+def test_any_of_several_hashes_resolves_the_wait(monkeypatch):
+    web3 = FakeWeb3(head=100, blocks={102: ['0xbb']})
+    watcher = make_watcher(monkeypatch, web3)
+
+    receipt = asyncio.run(watcher.wait(['0xaa', '0xbb'], rpc='http://rpc', proxy=None, confirmations=1, timeout=5))
+    assert receipt['transactionHash'] == '0xbb'
+
+
+def test_wait_gives_up_after_blocks(monkeypatch):
+    web3 = FakeWeb3(head=100, blocks={})
+    watcher = make_watcher(monkeypatch, web3)
+
+    assert asyncio.run(watcher.wait('0xaa', rpc='http://rpc', proxy=None, timeout=5, blocks=3)) is None
+    assert web3.head == 104
+    assert watcher.pending == 0
+
+
+def test_wait_times_out(monkeypatch):
+    web3 = FakeWeb3(head=100, blocks={})
+    watcher = make_watcher(monkeypatch, web3)
+    monkeypatch.setattr(receipt_watcher_module, 'RECEIPT_POLL_INTERVAL', 0.05)
+
+    assert asyncio.run(watcher.wait('0xaa', rpc='http://rpc', proxy=None, timeout=0.1)) is None
+    assert watcher.pending == 0
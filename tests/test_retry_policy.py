@@ -0,0 +1,48 @@
+from asyncio import TimeoutError
+
+from aiohttp import ClientResponseError
+from web3.exceptions import ContractLogicError
+
+from src.utils.wrappers.retry_policy import ErrorKind, RetryPolicy, classify_error
+
+
+def rate_limited(retry_after: str | None = None) -> ClientResponseError:
+    headers = {'Retry-After': retry_after} if retry_after is not None else None
+    return ClientResponseError(None, (), status=429, headers=headers)
+
+
+def test_classify_error():
+    assert classify_error(ContractLogicError('execution reverted')) == ErrorKind.REVERT
+    assert classify_error(ValueError('insufficient funds for gas * price + value')) == ErrorKind.REVERT
+    assert classify_error(ValueError('nonce too low')) == ErrorKind.NONCE
+    assert classify_error(rate_limited()) == ErrorKind.RATE_LIMIT
+    assert classify_error(ClientResponseError(None, (), status=502)) == ErrorKind.TRANSIENT
+    assert classify_error(TimeoutError()) == ErrorKind.TRANSIENT
+
+
+def test_revert_fails_fast():
+    assert RetryPolicy(retries=5).next_delay(ContractLogicError('execution reverted'), attempt=0) is None
+
+
+def test_gives_up_after_retries():
+    policy = RetryPolicy(retries=2)
+    assert policy.next_delay(TimeoutError(), attempt=1) is not None
+    assert policy.next_delay(TimeoutError(), attempt=2) is None
+
+
+def test_retry_after_is_honoured():
+    policy = RetryPolicy(retries=3, rate_limit_delay=10)
+    assert policy.next_delay(rate_limited('7'), attempt=0) == 7
+    assert policy.next_delay(rate_limited('0'), attempt=0) == 0
+
+
+def test_rate_limit_without_retry_after_uses_rate_limit_delay():
+    delay = RetryPolicy(retries=3, base_delay=1, rate_limit_delay=10).next_delay(rate_limited(), attempt=0)
+    assert 5 <= delay <= 10
+
+
+def test_delay_is_jittered_and_capped():
+    policy = RetryPolicy(retries=10, base_delay=2, max_delay=30)
+    delays = [policy.next_delay(TimeoutError(), attempt=8) for _ in range(50)]
+    assert all(15 <= delay <= 30 for delay in delays)
+    assert len(set(delays)) > 1
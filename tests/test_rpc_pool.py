@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.utils.request_client import rpc_pool as rpc_pool_module
+from src.utils.request_client.rpc_pool import RPCPoolProvider, get_endpoint_stats, is_endpoint_error
+
+RATE_LIMITED = {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32005, 'message': 'Too many requests'}}
+REVERTED = {'jsonrpc': '2.0', 'id': 1, 'error': {'code': 3, 'message': 'execution reverted'}}
+
+
+def result(value: str) -> dict:
+    return {'jsonrpc': '2.0', 'id': 1, 'result': value}
+
+
+class FakeProvider:
+    def __init__(self, answer, delay: float = 0) -> None:
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    async def make_request(self, method, params):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+
+def make_pool(monkeypatch, request, **providers: FakeProvider) -> RPCPoolProvider:
+    monkeypatch.setattr(rpc_pool_module, 'endpoint_stats', {})
+    monkeypatch.setattr(rpc_pool_module, 'RPC_HEDGE_MIN_DELAY', 0.01)
+    pool = RPCPoolProvider.__new__(RPCPoolProvider)
+    # Unique per test, so circuit breakers and scores from other tests do not leak in
+    pool.endpoint_uris = [f'https://{name}.{request.node.name}.rpc' for name in providers]
+    pool._providers = dict(zip(pool.endpoint_uris, providers.values()))
+    pool._background = set()
+    return pool
+
+
+def test_is_endpoint_error():
+    assert is_endpoint_error(RATE_LIMITED)
+    assert is_endpoint_error({'error': {'code': -32000, 'message': 'header not found'}})
+    assert not is_endpoint_error(REVERTED)
+    assert not is_endpoint_error({'error': {'code': -32000, 'message': 'nonce too low'}})
+    assert not is_endpoint_error(result('0x1'))
+
+
+def test_read_fails_over_on_error_response(monkeypatch, request):
+    pool = make_pool(monkeypatch, request, first=FakeProvider(RATE_LIMITED), second=FakeProvider(result('0x2')))
+
+    assert asyncio.run(pool._read('eth_blockNumber', [])) == result('0x2')
+    first, second = pool.endpoint_uris
+    assert get_endpoint_stats(first).error_rate > 0
+    assert get_endpoint_stats(second).error_rate == 0
+    assert pool._providers[first].calls == 1
+
+
+def test_read_fails_over_on_exception(monkeypatch, request):
+    pool = make_pool(
+        monkeypatch, request, first=FakeProvider(ConnectionError('refused')), second=FakeProvider(result('0x2'))
+    )
+    assert asyncio.run(pool._read('eth_blockNumber', [])) == result('0x2')
+
+
+def test_revert_is_returned_without_failover(monkeypatch, request):
+    pool = make_pool(monkeypatch, request, first=FakeProvider(REVERTED), second=FakeProvider(result('0x2')))
+
+    assert asyncio.run(pool._read('eth_call', [])) == REVERTED
+    assert pool._providers[pool.endpoint_uris[1]].calls == 0
+
+
+def test_error_response_is_returned_when_every_endpoint_fails(monkeypatch, request):
+    pool = make_pool(
+        monkeypatch, request, first=FakeProvider(RATE_LIMITED), second=FakeProvider(ConnectionError('refused'))
+    )
+    assert asyncio.run(pool._read('eth_blockNumber', [])) == RATE_LIMITED
+
+
+def test_exception_is_raised_when_every_endpoint_raises(monkeypatch, request):
+    pool = make_pool(
+        monkeypatch, request,
+        first=FakeProvider(ConnectionError('refused')), second=FakeProvider(ConnectionError('reset'))
+    )
+    with pytest.raises(ConnectionError, match='refused'):
+        asyncio.run(pool._read('eth_blockNumber', []))
+
+
+def test_slow_read_is_hedged(monkeypatch, request):
+    pool = make_pool(
+        monkeypatch, request, slow=FakeProvider(result('0x1'), delay=1), fast=FakeProvider(result('0x2'))
+    )
+    slow, fast = pool.endpoint_uris
+    get_endpoint_stats(slow).record(0.001, ok=True)
+    get_endpoint_stats(fast).record(0.01, ok=True)
+
+    assert asyncio.run(asyncio.wait_for(pool._read('eth_blockNumber', []), 0.5)) == result('0x2')
@@ -0,0 +1,132 @@
+import asyncio
+from collections import defaultdict
+
+from src.utils.worker_pool import WorkerPool
+
+
+class Tracker:
+    def __init__(self) -> None:
+        self.active = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.done = []
+
+    async def handle(self, item: dict) -> None:
+        keys = [('proxy', item['proxy'])] + [('chain', chain) for chain in item['chains']]
+        for key in keys:
+            self.active[key] += 1
+            self.peak[key] = max(self.peak[key], self.active[key])
+        await asyncio.sleep(0.01)
+        for key in keys:
+            self.active[key] -= 1
+        self.done.append(item['id'])
+
+
+def make_items() -> list[dict]:
+    return [
+        {'id': index, 'proxy': f'proxy-{index % 2}', 'chains': ['BASE'] if index % 3 else ['BASE', 'ARB']}
+        for index in range(30)
+    ]
+
+
+def run_pool(tracker: Tracker, **kwargs) -> WorkerPool:
+    pool = WorkerPool(
+        tracker.handle,
+        workers=10,
+        proxy_key=lambda item: item['proxy'],
+        chain_keys=lambda item: item['chains'],
+        **kwargs
+    )
+    asyncio.run(pool.run(make_items()))
+    return pool
+
+
+def test_per_proxy_cap():
+    tracker = Tracker()
+    pool = run_pool(tracker, per_proxy=2)
+    assert sorted(tracker.done) == list(range(30))
+    assert pool.completed == 30
+    assert tracker.peak[('proxy', 'proxy-0')] == 2
+    assert tracker.peak[('proxy', 'proxy-1')] == 2
+
+
+def test_per_chain_cap():
+    tracker = Tracker()
+    run_pool(tracker, per_chain=3)
+    assert sorted(tracker.done) == list(range(30))
+    assert tracker.peak[('chain', 'BASE')] == 3
+    assert tracker.peak[('chain', 'ARB')] <= 3
+
+
+def test_no_cap_uses_all_workers():
+    tracker = Tracker()
+    run_pool(tracker)
+    assert tracker.peak[('chain', 'BASE')] == 10
+
+
+def test_failures_and_deferred_outcomes():
+    async def run() -> WorkerPool:
+        loop = asyncio.get_running_loop()
+
+        async def handle(item: int):
+            if item == 0:
+                raise ValueError('boom')
+            if item == 1:
+                return False
+            if item in (2, 3):
+                # Finished later, after the pool slot is free
+                future = loop.create_future()
+                loop.call_later(0.05, future.set_result, item == 2)
+                return future
+            return True
+
+        pool = WorkerPool(handle, workers=2)
+        await pool.run(range(6))
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.completed == 3
+    assert pool.failed == 3
+
+
+def test_deferred_item_keeps_its_proxy_slot():
+    async def run() -> list:
+        loop = asyncio.get_running_loop()
+        events = []
+
+        async def handle(item: str):
+            events.append(f'start {item}')
+            if item == 'a':
+                future = loop.create_future()
+                loop.call_later(0.05, lambda: (events.append('a resolved'), future.set_result(True)))
+                return future
+            return True
+
+        pool = WorkerPool(handle, workers=2, per_proxy=1, proxy_key=lambda item: 'proxy')
+        await pool.run(['a', 'b'])
+        assert pool.completed == 2
+        return events
+
+    assert asyncio.run(run()) == ['start a', 'a resolved', 'start b']
+
+
+def test_on_admit_only_sees_admitted_items():
+    async def run() -> list:
+        events = []
+
+        async def handle(item: str) -> bool:
+            events.append(f'start {item}')
+            await asyncio.sleep(0.01)
+            return True
+
+        pool = WorkerPool(
+            handle, workers=3, per_proxy=1, start_spacing=0.02,
+            proxy_key=lambda item: item[0], on_admit=lambda item: events.append(f'admit {item}')
+        )
+        await pool.run(['a1', 'a2', 'b1'])
+        return events
+
+    events = asyncio.run(run())
+    # b1 is admitted while a1 runs, a2 only once a1 has freed proxy "a"
+    assert events.index('admit b1') < events.index('start b1')
+    assert events.index('start a1') < events.index('admit a2')
+    assert events.count('admit a2') == 1